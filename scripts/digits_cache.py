@@ -0,0 +1,62 @@
+"""
+Benchmark convert_to_scientific_if_longer with and without the LRU cache on a skewed, report-like
+distribution of numeric strings: a few learning rates, seeds and metric buckets repeat heavily.
+"""
+
+# python scripts/digits_cache.py
+
+import time
+
+import numpy as np
+
+from ectools.digits import (
+    conversion_cache_clear_,
+    conversion_cache_info,
+    convert_to_scientific_if_longer,
+    convert_to_scientific_if_longer_cached,
+    warm_conversion_cache_,
+)
+
+
+def vocabulary(rng: np.random.Generator) -> list[str]:
+    learning_rates = [f"{m}e-{e}" for m in (1, 3, 5) for e in range(2, 7)]
+    learning_rates += [f"{m * 10.0**-e:.{e}f}" for m in (1, 3, 5) for e in range(2, 7)]
+    seeds = [str(seed) for seed in (0, 1, 2, 42, 1234, 31415, 271828)]
+    buckets = [f"{x:.4f}" for x in np.round(rng.random(2000), 4)]
+    sizes = [str(2**k) for k in range(4, 24)]
+    return learning_rates + seeds + buckets + sizes
+
+
+def seconds(f, values: list[str]) -> float:
+    start = time.perf_counter()
+    for value in values:
+        f(value)
+    return time.perf_counter() - start
+
+
+def main():
+    rng = np.random.default_rng(0)
+    words = vocabulary(rng)
+    for zipf_exponent in (1.1, 1.5, 2.0):
+        ranks = np.minimum(rng.zipf(zipf_exponent, size=500_000), len(words)) - 1
+        values = [words[rank] for rank in rng.permutation(len(words))[ranks]]
+
+        conversion_cache_clear_()
+        uncached = seconds(convert_to_scientific_if_longer, values)
+        cold = seconds(convert_to_scientific_if_longer_cached, values)
+        info = conversion_cache_info()
+        conversion_cache_clear_()
+        warm_conversion_cache_(words)
+        warm = seconds(convert_to_scientific_if_longer_cached, values)
+
+        print("=" * 60)
+        print(f"zipf exponent {zipf_exponent}, {len(values)} values, {len(set(values))} distinct")
+        print("=" * 60)
+        print(f"{'uncached':<24}{uncached:>10.3f} s")
+        print(f"{'cached, cold':<24}{cold:>10.3f} s{uncached / cold:>10.1f}x")
+        print(f"{'cached, warmed':<24}{warm:>10.3f} s{uncached / warm:>10.1f}x")
+        print(f"cold cache: {info.hits} hits, {info.misses} misses, {info.currsize} entries")
+
+
+if __name__ == "__main__":
+    main()
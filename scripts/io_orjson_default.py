@@ -0,0 +1,97 @@
+"""
+Benchmark saving a configuration per call: converting frozendict, DictConfig and dataclass
+configurations to plain containers before orjson.dumps, against encoding them directly with the
+ectools.io.orjson_default hook.
+"""
+
+# python scripts/io_orjson_default.py
+
+import dataclasses
+import timeit
+from collections.abc import Mapping
+
+import orjson
+from frozendict import deepfreeze
+from omegaconf import OmegaConf
+
+from ectools.io import orjson_default
+
+option = orjson.OPT_APPEND_NEWLINE | orjson.OPT_INDENT_2
+
+
+@dataclasses.dataclass
+class Layer:
+    width: int
+    dropout: float
+    activations: tuple[str, ...]
+
+
+@dataclasses.dataclass
+class Model:
+    name: str
+    layers: list[Layer]
+
+
+def container(num_layers: int) -> dict:
+    layers = {
+        f"layer_{i}": {"width": 64 * (i % 8 + 1), "dropout": 0.1, "activations": ["relu", "gelu"]}
+        for i in range(num_layers)
+    }
+    return {"model": {"name": "mlp", "layers": layers}, "optimizer": {"lr": 1e-3, "betas": [0.9]}}
+
+
+def plain_rcrs(x):
+    # what callers do today: rebuild plain containers, then serialize
+    if isinstance(x, Mapping):
+        return {k: plain_rcrs(v) for k, v in x.items()}
+    if isinstance(x, (list, tuple, frozenset)):
+        return [plain_rcrs(v) for v in x]
+    return x
+
+
+def report(name: str, f, number: int) -> None:
+    seconds = min(timeit.repeat(f, number=number, repeat=5)) / number
+    print(f"{name:<44}{seconds * 1e6:>12.1f} us")
+
+
+def main():
+    for num_layers in (10, 100, 1000):
+        frozen = deepfreeze(container(num_layers))
+        dictconfig = OmegaConf.create(container(num_layers))
+        model = Model("mlp", [Layer(64, 0.1, ("relu", "gelu")) for _ in range(num_layers)])
+        assert orjson.dumps(frozen, default=orjson_default) == orjson.dumps(plain_rcrs(frozen))
+        number = max(1, 20_000 // num_layers)
+
+        print("=" * 60)
+        print(f"{num_layers} layers, {number} calls per timing")
+        print("=" * 60)
+        report("frozendict: convert, then dumps", lambda: orjson.dumps(plain_rcrs(frozen)), number)
+        report(
+            "frozendict: dumps with orjson_default",
+            lambda: orjson.dumps(frozen, default=orjson_default, option=option),
+            number,
+        )
+        report(
+            "DictConfig: to_container, then dumps",
+            lambda: orjson.dumps(OmegaConf.to_container(dictconfig, resolve=True), option=option),
+            number,
+        )
+        report(
+            "DictConfig: dumps with orjson_default",
+            lambda: orjson.dumps(dictconfig, default=orjson_default, option=option),
+            number,
+        )
+        report(
+            "dataclass: asdict, then dumps",
+            lambda: orjson.dumps(dataclasses.asdict(model), option=option),
+            number,
+        )
+        report(
+            "dataclass: dumps with orjson_default",
+            lambda: orjson.dumps(model, default=orjson_default, option=option),
+            number,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark import time of ectools.math with and without scipy.special, and the throughput of
+ectools.math.logsumexp_numpy (plain, with out= and scratch=) against scipy.special.logsumexp.
+"""
+
+# python scripts/math_logsumexp.py
+
+import statistics
+import subprocess
+import sys
+import timeit
+
+import numpy as np
+from scipy import special
+
+from ectools.math import logsumexp_numpy
+
+
+def import_seconds(statement: str, repeat: int = 7) -> float:
+    code = f"import time; t = time.perf_counter(); {statement}; print(time.perf_counter() - t)"
+    command = [sys.executable, "-c", code]
+    runs = (
+        subprocess.run(command, capture_output=True, text=True, check=True) for _ in range(repeat)
+    )
+    return statistics.median(float(run.stdout) for run in runs)
+
+
+def report(name: str, f, number: int) -> None:
+    seconds = min(timeit.repeat(f, number=number, repeat=5)) / number
+    print(f"{name:<36}{seconds * 1e3:>10.3f} ms")
+
+
+def main():
+    print("=" * 60)
+    print("import time (median of fresh interpreters)")
+    print("=" * 60)
+    for statement in ("import ectools.math", "import ectools.math; import scipy.special"):
+        print(f"{statement:<48}{import_seconds(statement) * 1e3:>8.1f} ms")
+
+    for shape, axis in (((1000,), None), ((1000, 1000), -1), ((64, 4096), 0), ((256, 32, 512), 1)):
+        a = np.random.default_rng(0).standard_normal(shape)
+        scratch = np.empty_like(a)
+        out = np.empty(np.sum(a, axis=axis, keepdims=False).shape)
+        number = max(1, 2**24 // a.size)
+
+        print("=" * 60)
+        print(f"shape {shape}, axis {axis}, {number} calls per timing")
+        print("=" * 60)
+        report("scipy.special.logsumexp", lambda: special.logsumexp(a, axis=axis), number)
+        report("logsumexp_numpy", lambda: logsumexp_numpy(a, axis=axis), number)
+        if axis is not None:
+            report(
+                "logsumexp_numpy (out=, scratch=)",
+                lambda: logsumexp_numpy(a, axis=axis, out=out, scratch=scratch),
+                number,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Benchmark suite for the hot helpers in ectools.numpy: fill_diagonal, np_generalized_concat and
+np_prng. Sweeps shapes, batch sizes, dtypes and memory layouts, records the time per call and the
+peak memory traced during one call, writes the results as JSON and compares them with a saved
+baseline, exiting with status 1 on regressions.
+"""
+
+# python scripts/numpy_benchmark.py --output bench.json
+# python scripts/numpy_benchmark.py --output bench_new.json --baseline bench.json --tolerance 0.25
+
+import argparse
+import itertools
+import json
+import platform
+import sys
+import timeit
+import tracemalloc
+from collections.abc import Callable, Iterator
+from typing import Any
+
+import numpy as np
+
+from ectools.numpy import (
+    NpAccumulator,
+    fill_diagonal,
+    fill_diagonal_,
+    np_generalized_concat,
+    np_prng,
+    np_prng_fill_,
+)
+
+layouts = ("C", "F", "strided")
+
+
+def array_with_layout(shape: tuple[int, ...], dtype: np.dtype, layout: str) -> np.ndarray:
+    match layout:
+        case "C":
+            return np.ones(shape, dtype=dtype, order="C")
+        case "F":
+            return np.ones(shape, dtype=dtype, order="F")
+        case "strided":
+            return np.ones((*shape[:-1], 2 * shape[-1]), dtype=dtype)[..., ::2]
+        case _:
+            raise ValueError(f"Unknown layout {layout}")
+
+
+def measured(f: Callable[[], Any], min_seconds: float) -> dict[str, float]:
+    f()
+    number, seconds = timeit.Timer(f).autorange()
+    number = max(1, int(number * min_seconds / max(seconds, 1e-9)))
+    seconds = min(timeit.repeat(f, number=number, repeat=5)) / number
+    tracemalloc.start()
+    f()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": seconds, "peak_bytes": peak}
+
+
+def fill_diagonal_cases(quick: bool) -> Iterator[tuple[str, Callable[[], Any]]]:
+    sizes = (64, 256) if quick else (64, 256, 1024)
+    batch_sizes = (1, 16) if quick else (1, 16, 64)
+    dtypes = (np.float32, np.bool_) if quick else (np.float32, np.float64, np.bool_)
+    for n, batch_size, dtype, layout in itertools.product(sizes, batch_sizes, dtypes, layouts):
+        if batch_size * n * n > 2**26:
+            continue
+        x = array_with_layout((batch_size, n, n), np.dtype(dtype), layout)
+        case = f"shape=({batch_size},{n},{n})|dtype={np.dtype(dtype).name}|layout={layout}"
+        yield f"fill_diagonal|{case}", lambda x=x: fill_diagonal(x, 0)
+        yield f"fill_diagonal_|{case}", lambda x=x: fill_diagonal_(x, 0)
+
+
+def concat_cases(quick: bool) -> Iterator[tuple[str, Callable[[], Any]]]:
+    num_chunks = (16, 256) if quick else (16, 256, 1024)
+    widths = (8, 256)
+    dtypes = (np.float32,) if quick else (np.float32, np.float64)
+    for k, width, dtype, layout in itertools.product(num_chunks, widths, dtypes, layouts):
+        chunks = tuple(array_with_layout((4, width), np.dtype(dtype), layout) for _ in range(k))
+        rows = tuple(chunk[0] for chunk in chunks)
+        case = f"chunks={k}x(4,{width})|dtype={np.dtype(dtype).name}|layout={layout}"
+
+        def accumulated(chunks=chunks):
+            accumulator = NpAccumulator()
+            accumulator.extend(chunks)
+            return accumulator.finalize()
+
+        yield f"np_generalized_concat|concat|{case}", lambda: np_generalized_concat(chunks)
+        yield f"np_generalized_concat|stack|{case}", lambda: np_generalized_concat(rows)
+        yield f"NpAccumulator|concat|{case}", accumulated
+
+
+def prng_cases(quick: bool) -> Iterator[tuple[str, Callable[[], Any]]]:
+    yield "np_prng|construct", lambda: np_prng(0)
+    sizes = (2**12, 2**20) if quick else (2**12, 2**20, 2**24)
+    for size, dtype, layout in itertools.product(sizes, (np.float32, np.float64), ("C", "F")):
+        out = array_with_layout((size // 64, 64), np.dtype(dtype), layout)
+        case = f"size={size}|dtype={np.dtype(dtype).name}|layout={layout}"
+        yield f"np_prng|standard_normal|{case}", lambda out=out: np_prng(0).standard_normal(
+            out=out, dtype=out.dtype
+        )
+        yield f"np_prng_fill_|standard_normal|{case}", lambda out=out: np_prng_fill_(out, 0)
+
+
+def results(quick: bool, min_seconds: float, match: str) -> dict[str, dict[str, float]]:
+    table = {}
+    cases = itertools.chain(fill_diagonal_cases(quick), concat_cases(quick), prng_cases(quick))
+    for name, f in cases:
+        if match not in name:
+            continue
+        table[name] = measured(f, min_seconds)
+        print(
+            f"{name:<90}{table[name]['seconds'] * 1e6:>12.1f} us"
+            f"{table[name]['peak_bytes'] / 2**20:>10.2f} MiB"
+        )
+    return table
+
+
+def regressions(
+    table: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]], tolerance: float
+) -> list[str]:
+    found = []
+    for name in sorted(table.keys() & baseline.keys()):
+        for metric in ("seconds", "peak_bytes"):
+            new, old = table[name][metric], baseline[name][metric]
+            if new > old * (1 + tolerance) and new - old > (1e-6 if metric == "seconds" else 4096):
+                found.append(f"{name} {metric}: {old:.4g} -> {new:.4g} ({new / old:.2f}x)")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--output", type=str, default=None, help="JSON file to write results to")
+    parser.add_argument("--baseline", type=str, default=None, help="JSON results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="time budget per repeat")
+    parser.add_argument("--match", type=str, default="", help="only run cases containing this")
+    parser.add_argument("--quick", action="store_true", help="a smaller sweep")
+    args = parser.parse_args()
+
+    table = results(args.quick, args.min_seconds, args.match)
+    if args.output is not None:
+        document = {
+            "numpy": np.__version__,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": table,
+        }
+        with open(args.output, "w") as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+
+    if args.baseline is not None:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["results"]
+        found = regressions(table, baseline, args.tolerance)
+        print(f"\n{len(found)} regressions against {args.baseline}")
+        print("\n".join(found))
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
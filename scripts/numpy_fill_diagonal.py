@@ -0,0 +1,57 @@
+"""
+Benchmark the copy-based ectools.numpy.fill_diagonal against the in-place,
+out= and band fill variants on batched (B, N, N) arrays.
+"""
+
+# python scripts/numpy_fill_diagonal.py
+
+import timeit
+import tracemalloc
+
+import numpy as np
+
+from ectools.numpy import fill_band, fill_band_, fill_diagonal, fill_diagonal_
+
+
+def peak_memory_mib(f) -> float:
+    tracemalloc.start()
+    f()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20
+
+
+def report(name: str, f, number: int) -> None:
+    seconds = min(timeit.repeat(f, number=number, repeat=5)) / number
+    print(f"{name:<28}{seconds * 1e3:>10.3f} ms{peak_memory_mib(f):>12.2f} MiB")
+
+
+def main():
+    for batch_size, n in ((8, 256), (32, 512), (64, 1024)):
+        x = np.random.default_rng(0).random((batch_size, n, n), dtype=np.float32)
+        out = np.empty_like(x)
+        per_batch = np.arange(batch_size, dtype=x.dtype)[:, None]
+        offsets = range(-2, 3)
+        number = max(1, 2**26 // x.size)
+
+        print("=" * 60)
+        print(f"shape {x.shape}, {x.nbytes / 2**20:.1f} MiB, {number} calls per timing")
+        print("=" * 60)
+        report("fill_diagonal (copy)", lambda: fill_diagonal(x, 0.0), number)
+        report("fill_diagonal (out=)", lambda: fill_diagonal(x, 0.0, out=out), number)
+        report("fill_diagonal_", lambda: fill_diagonal_(x, 0.0), number)
+        report("fill_diagonal_ (per batch)", lambda: fill_diagonal_(x, per_batch), number)
+
+        def band_with_copies():
+            y = x
+            for offset in offsets:
+                y = fill_diagonal(y, 0.0, offset=offset)
+            return y
+
+        report("band via fill_diagonal", band_with_copies, number)
+        report("fill_band (copy)", lambda: fill_band(x, 0.0, offsets), number)
+        report("fill_band_", lambda: fill_band_(x, 0.0, offsets), number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+CPU benchmark of ectools.torch diagonal writes on batched attention masks:
+set_diagonal (diagonal_scatter), fill_diagonal (clone) and fill_diagonal_ (in place).
+"""
+
+# python scripts/torch_fill_diagonal.py
+
+import timeit
+
+import torch
+
+from ectools.torch import fill_diagonal, fill_diagonal_, set_diagonal
+
+
+def report(name: str, f, number: int) -> None:
+    seconds = min(timeit.repeat(f, number=number, repeat=5)) / number
+    print(f"{name:<36}{seconds * 1e3:>10.3f} ms")
+
+
+def main():
+    torch.set_num_threads(1)
+    for batch_size, n, dtype in (
+        (8, 256, torch.bool),
+        (32, 512, torch.bool),
+        (16, 1024, torch.float32),
+    ):
+        x = torch.ones(batch_size, n, n, dtype=dtype)
+        out = torch.empty_like(x)
+        per_batch = torch.zeros(batch_size, 1, dtype=dtype)
+        number = max(1, 2**26 // x.numel())
+
+        print("=" * 60)
+        print(f"shape {tuple(x.shape)}, {dtype}, {number} calls per timing")
+        print("=" * 60)
+        report("set_diagonal", lambda: set_diagonal(x, 0), number)
+        report("set_diagonal (out=)", lambda: set_diagonal(x, 0, out=out), number)
+        report("fill_diagonal", lambda: fill_diagonal(x, 0), number)
+        report("fill_diagonal (out=)", lambda: fill_diagonal(x, 0, out=out), number)
+        report("fill_diagonal_", lambda: fill_diagonal_(x, 0), number)
+        report("fill_diagonal_ (per batch)", lambda: fill_diagonal_(x, per_batch), number)
+
+
+if __name__ == "__main__":
+    main()
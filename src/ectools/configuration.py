@@ -1,4 +1,5 @@
 import argparse
+import pickle
 import warnings
 from collections.abc import Mapping, Sequence
 from dataclasses import is_dataclass
@@ -11,6 +12,7 @@ from frozendict import deepfreeze
 from omegaconf import DictConfig, OmegaConf
 
 from .dataclasses import DataclassLike
+from .io import parse_cached
 
 
 class DictConfigMerger(Protocol):
@@ -28,10 +30,26 @@ def dictconfig_created(default: Mapping | DataclassLike | None) -> DictConfig:
     return OmegaConf.create(default)  # type: ignore
 
 
-def dictconfig_ex_file(filepath: str) -> DictConfig:
+def _pickled_dictconfig_ex_file(filepath: str) -> bytes:
+    # unpickling a DictConfig is several times faster than OmegaConf.create from a container
+    return pickle.dumps(OmegaConf.load(filepath), protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def dictconfig_ex_file(
+    filepath: str, cache: bool = True, cache_dirpath: str | None = None
+) -> DictConfig:
+    """
+    With cache, the parsed file is reused while its mtime and size are unchanged, optionally across
+    processes through cache_dirpath; see io.parse_cached. Each call returns a new DictConfig.
+    """
     if not filepath:
         return OmegaConf.create()
-    return OmegaConf.load(filepath)  # type: ignore
+    if not cache:
+        return OmegaConf.load(filepath)  # type: ignore
+    parsed = parse_cached(
+        filepath, _pickled_dictconfig_ex_file, cache_dirpath, "ectools.configuration.dictconfig"
+    )
+    return pickle.loads(parsed)
 
 
 def dictconfig_ex_dotlist(dotlist: Sequence[str]) -> DictConfig:
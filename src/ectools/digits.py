@@ -1,8 +1,13 @@
+from collections.abc import Callable, Iterable
 from decimal import Decimal, localcontext
+from functools import lru_cache
+from functools import partial as prt
 import logging
+import sys
+from typing import Any
 
 import numpy as np
-
+from numpy.typing import ArrayLike
 
 logger = logging.getLogger(__name__)
 
@@ -52,6 +57,139 @@ def convert_to_scientific_if_longer(x: str, max_length: int = 3) -> str:
     return output
 
 
+# ================================================================
+# memoized conversion for heavily repeated values
+
+_conversion_cache_size = 2**16
+
+
+@lru_cache(maxsize=_conversion_cache_size)
+def _convert_to_scientific_if_longer_cached(x: str, max_length: int) -> str:
+    return convert_to_scientific_if_longer(x, max_length)
+
+
+def convert_to_scientific_if_longer_cached(
+    x: str, max_length: int = 3, use_cache: bool = True
+) -> str:
+    """convert_to_scientific_if_longer through a bounded LRU cache keyed on (x, max_length)"""
+    if not use_cache:
+        return convert_to_scientific_if_longer(x, max_length)
+    return _convert_to_scientific_if_longer_cached(x, max_length)
+
+
+def warm_conversion_cache_(values: Iterable[str], max_length: int = 3) -> None:
+    for x in values:
+        _convert_to_scientific_if_longer_cached(x, max_length)
+
+
+conversion_cache_info = _convert_to_scientific_if_longer_cached.cache_info
+conversion_cache_clear_ = _convert_to_scientific_if_longer_cached.cache_clear
+
+
+# ================================================================
+# batch versions over NumPy string arrays or polars Series
+
+
+def _string_array(x: ArrayLike) -> np.ndarray:
+    if "polars" in sys.modules and isinstance(x, sys.modules["polars"].Series):
+        x = x.to_numpy()
+    return np.asarray(x, dtype=np.dtypes.StringDType())
+
+
+def _like_input(x: ArrayLike, y: np.ndarray) -> ArrayLike:
+    if "polars" in sys.modules and isinstance(x, sys.modules["polars"].Series):
+        return sys.modules["polars"].Series(x.name, y)
+    return y
+
+
+def _elementwise(f: Callable[[str], Any], x: np.ndarray) -> np.ndarray:
+    return np.frompyfunc(f, 1, 1)(x.astype(object))
+
+
+def _is_plain_decimal(x: np.ndarray) -> np.ndarray:
+    """optionally signed strings of ASCII digits with at most one decimal point"""
+    body = np.where(
+        np.strings.startswith(x, "-") | np.strings.startswith(x, "+"),
+        np.strings.slice(x, 1, None),
+        x,
+    )
+    digits = np.strings.replace(body, ".", "", 1)
+    return (np.strings.str_len(digits) > 0) & (np.strings.strip(digits, "0123456789") == "")
+
+
+def trailing_zeros_count_array(x: ArrayLike) -> ArrayLike:
+    y = _string_array(x)
+    return _like_input(x, np.strings.str_len(y) - np.strings.str_len(np.strings.rstrip(y, "0")))
+
+
+def is_number_array(x: ArrayLike) -> ArrayLike:
+    """vectorised for plain decimals; other strings, e.g. with exponents, go through float"""
+    y = _string_array(x)
+    result = _is_plain_decimal(y)
+    rest = ~result
+    result[rest] = _elementwise(is_number, y[rest]).astype(bool)
+    return _like_input(x, result)
+
+
+def is_scientific_notation_array(x: ArrayLike) -> ArrayLike:
+    y = _string_array(x)
+    result = np.asarray(is_number_array(y)) & (np.strings.find(np.strings.lower(y), "e") >= 0)
+    return _like_input(x, result)
+
+
+def _plain_decimal_to_scientific(x: np.ndarray) -> np.ndarray:
+    """convert_to_scientific_if_longer for plain decimals by string operations, which are exact"""
+    num_digits = np.strings.str_len(x) - trailing_zeros_count_array(x) - np.strings.count(x, ".")
+    negative = np.strings.startswith(x, "-")
+    body = np.where(negative | np.strings.startswith(x, "+"), np.strings.slice(x, 1, None), x)
+    point = np.strings.find(body, ".")
+    integer_length = np.where(point < 0, np.strings.str_len(body), point)
+    digits = np.strings.replace(body, ".", "", 1)
+    significant = np.strings.lstrip(digits, "0")
+    exponent = integer_length - 1 - (np.strings.str_len(digits) - np.strings.str_len(significant))
+    mantissa = np.strings.ljust(np.strings.rstrip(significant, "0"), num_digits, "0")
+    point = np.where(num_digits > 1, ".", "")
+    sign = np.where(negative, "-", "")
+    exponent_sign = np.where(exponent < 0, "e-", "e+")
+    head, tail = np.strings.slice(mantissa, 0, 1), np.strings.slice(mantissa, 1, None)
+    return sign + head + point + tail + exponent_sign + np.abs(exponent).astype(mantissa.dtype)
+
+
+def convert_to_scientific_if_longer_array(
+    x: ArrayLike, max_length: int = 3, verify: bool = True
+) -> ArrayLike:
+    """
+    Batch convert_to_scientific_if_longer: plain decimals are converted by vectorised string
+    operations and the rest element by element; `verify` checks all conversions in one pass.
+    """
+    y = _string_array(x)
+    plain = _is_plain_decimal(y)
+    numbers = plain.copy()
+    numbers[~plain] = _elementwise(is_number, y[~plain]).astype(bool)
+    if not numbers.all():
+        raise AssertionError(f"Value {y[~numbers][0]} is not a number")
+
+    converted = np.strings.str_len(y) > max_length
+    converted[~plain] &= np.strings.find(np.strings.lower(y[~plain]), "e") < 0
+    nonzero = np.strings.strip(y, "+-.0") != ""
+    vectorised = converted & plain & nonzero
+    elementwise = converted & ~vectorised
+    result = y.copy()
+    result[vectorised] = _plain_decimal_to_scientific(y[vectorised])
+    result[elementwise] = _elementwise(
+        prt(convert_to_scientific_if_longer, max_length=max_length), y[elementwise]
+    )
+
+    if verify:
+        close = np.isclose(result[converted].astype(np.float64), y[converted].astype(np.float64))
+        if not close.all():
+            raise AssertionError(
+                f"Conversion error: {result[converted][~close][0]} != {y[converted][~close][0]}"
+            )
+    logger.debug(f"Converted {np.count_nonzero(converted)} of {len(y)} values")
+    return _like_input(x, result)
+
+
 if __name__ == "__main__":
     from .logging import set_root_logger
 
@@ -63,3 +201,27 @@ if __name__ == "__main__":
     convert_to_scientific_if_longer("12345678901234567890")
     convert_to_scientific_if_longer("1234567890.1234567890")
     convert_to_scientific_if_longer("100")
+
+    values = ["1000", "0.001", "-1000", "+1000", "1000.", ".0015", "00120", "999", "1e5", "1_000"]
+    values += ["12345678901234567890", "1234567890.1234567890", " 12", "inf", "-0.000120"]
+    expected = [convert_to_scientific_if_longer(value) for value in values]
+    assert convert_to_scientific_if_longer_array(values).tolist() == expected
+    assert is_number_array(values + ["abc", "1.2.3"]).tolist() == [True] * len(values) + [False] * 2
+    assert is_scientific_notation_array(["1e5", "1E-2", "e", "100"]).tolist() == [
+        True,
+        True,
+        False,
+        False,
+    ]
+    assert trailing_zeros_count_array(["100", "1.50", "7"]).tolist() == [2, 1, 0]
+    conversion_cache_clear_()
+    warm_conversion_cache_(values[:4])
+    assert [convert_to_scientific_if_longer_cached(value) for value in values] == expected
+    assert conversion_cache_info().hits == 4 and conversion_cache_info().misses == len(values)
+    assert convert_to_scientific_if_longer_cached("1000", use_cache=False) == "1e+3"
+    assert conversion_cache_info().hits == 4
+    try:
+        convert_to_scientific_if_longer_array(["1000", "abc"])
+        raise RuntimeError("non-number was accepted")
+    except AssertionError:
+        pass
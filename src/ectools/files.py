@@ -1,6 +1,137 @@
+import os
+
+lines_block_size: int = 2**20
+
+
+def _first_n_lines_end(file, n: int) -> int | None:
+    # byte offset just after the n-th newline, None if there are fewer
+    if n <= 0:
+        return 0
+    count, offset = 0, 0
+    while block := file.read(lines_block_size):
+        k = block.count(b"\n")
+        if count + k >= n:
+            index = -1
+            for _ in range(n - count):
+                index = block.index(b"\n", index + 1)
+            return offset + index + 1
+        count, offset = count + k, offset + len(block)
+    return None
+
+
+def _last_n_lines_start(file, n: int) -> int:
+    # byte offset where the last n lines start, reading backwards; a final newline ends the last
+    # line rather than starting an empty one
+    size = position = file.seek(0, os.SEEK_END)
+    if n <= 0:
+        return size
+    file.seek(max(0, size - 1))
+    target = n + (file.read(1) == b"\n")
+    while position > 0:
+        start = max(0, position - lines_block_size)
+        file.seek(start)
+        block = file.read(position - start)
+        k = block.count(b"\n")
+        if k >= target:
+            index = len(block)
+            for _ in range(target):
+                index = block.rindex(b"\n", 0, index)
+            return start + index + 1
+        target, position = target - k, start
+    return 0
+
+
 def keep_first_n_lines(file_path: str, n: int):
-    with open(file_path, "r") as file:
-        lines = file.readlines()
-    kept_lines = lines[:n]
-    with open(file_path, "w") as file:
-        file.writelines(kept_lines)
+    """
+    Truncate the file in place after its n-th line, scanning it in blocks. As with lines[:n], a
+    negative n drops the last -n lines instead, scanning backwards from the end.
+    """
+    with open(file_path, "r+b") as file:
+        end = _first_n_lines_end(file, n) if n >= 0 else _last_n_lines_start(file, -n)
+        if end is not None:
+            file.truncate(end)
+
+
+def _check_last_n(n: int):
+    if n < 0:
+        raise ValueError(f"The number of last lines must be non-negative, got {n}")
+
+
+def keep_last_n_lines(file_path: str, n: int):
+    """Move the last n lines of the file to its start in blocks and truncate the rest"""
+    _check_last_n(n)
+    with open(file_path, "r+b") as file:
+        read_position = _last_n_lines_start(file, n)
+        write_position = 0
+        if read_position == 0:
+            return
+        while True:
+            file.seek(read_position)
+            block = file.read(lines_block_size)
+            if not block:
+                break
+            file.seek(write_position)
+            file.write(block)
+            read_position += len(block)
+            write_position += len(block)
+        file.truncate(write_position)
+
+
+def tail(file_path: str, n: int = 10) -> str:
+    """The last n lines of the file, read backwards from its end in blocks"""
+    _check_last_n(n)
+    with open(file_path, "rb") as file:
+        file.seek(_last_n_lines_start(file, n))
+        return file.read().decode("utf-8", errors="replace")
+
+
+def _test():
+    import io
+    import random
+    import tempfile
+
+    global lines_block_size
+    rng = random.Random(0)
+    default_block_size = lines_block_size
+    try:
+        with tempfile.TemporaryDirectory() as dirname:
+            file_path = f"{dirname}/lines.txt"
+            for _ in range(500):
+                pieces = [rng.choice(["a", "bc", "é", "\r", ""]) for _ in range(rng.randrange(8))]
+                lines = [piece + "\n" for piece in pieces]
+                if rng.random() < 0.5:
+                    lines.append(rng.choice(["d", "éf"]))
+                content = "".join(lines).encode()
+                lines = io.BytesIO(content).readlines()
+                n = rng.randrange(-len(lines) - 2, len(lines) + 3)
+                lines_block_size = rng.choice([1, 2, 3, 7, default_block_size])
+
+                with open(file_path, "wb") as file:
+                    file.write(content)
+                keep_first_n_lines(file_path, n)
+                with open(file_path, "rb") as file:
+                    assert file.read() == b"".join(lines[:n]), (content, n)
+
+                with open(file_path, "wb") as file:
+                    file.write(content)
+                if n < 0:
+                    for function in (tail, keep_last_n_lines):
+                        try:
+                            function(file_path, n)
+                            raise AssertionError(f"{function.__name__} accepted n={n}")
+                        except ValueError:
+                            pass
+                    continue
+                expected = b"".join(lines[max(0, len(lines) - n) :])
+                assert tail(file_path, n) == expected.decode(), (content, n)
+                keep_last_n_lines(file_path, n)
+                with open(file_path, "rb") as file:
+                    assert file.read() == expected, (content, n)
+    finally:
+        lines_block_size = default_block_size
+    print("All files tests passed.")
+
+
+# python -m src.ectools.files
+if __name__ == "__main__":
+    _test()
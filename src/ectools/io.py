@@ -1,10 +1,37 @@
+import atexit
+import bz2
+import codecs
+import glob
+import gzip
+import hashlib
+import itertools
 import json
+import lzma
+import math
+import mmap
 import os
 import os.path as osp
-from collections.abc import Mapping, Sequence
+import pickle
+import re
+import shutil
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence, Set
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import ExitStack, contextmanager
+from typing import IO, TYPE_CHECKING, Any, Literal, NamedTuple
 
 import orjson
 import yaml
+from frozendict import deepfreeze, frozendict
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# the libyaml bindings are several times faster when PyYAML was built with them
+YamlSafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+YamlSafeDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
 
 
 def read_file(filepath: str) -> str:
@@ -12,23 +39,552 @@ def read_file(filepath: str) -> str:
         return file.read()
 
 
-def write_file_(filepath: str, content: str) -> None:
-    with open(filepath, "w") as file:
-        file.write(content)
+def _fsync_directory(dirpath: str) -> None:
+    # persists a rename; directories cannot be opened for fsync on some platforms, e.g. Windows
+    try:
+        fd = os.open(dirpath, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def _atomic_open(filepath: str, mode: str, atomic: bool = True) -> Iterator[IO]:
+    """
+    open(filepath, mode) for writing. With atomic, the content goes to a temporary file next to the
+    target that is fsynced and renamed over it on success, followed by an fsync of the directory,
+    so readers, crashes and power losses only ever see the old or the new file, never a partial one.
+    As with a plain write, a symlink is written through to its target and an existing file keeps
+    its permissions.
+    """
+    os.makedirs(osp.dirname(filepath) or ".", exist_ok=True)
+    if not atomic:
+        with open(filepath, mode) as f:
+            yield f
+        return
+    filepath = osp.realpath(filepath)
+    temporary_filepath = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporary_filepath, mode.replace("w", "x")) as f:
+            yield f
+            if osp.exists(filepath):
+                shutil.copymode(filepath, temporary_filepath)
+            # without the fsyncs, a power loss can leave the renamed file empty
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_filepath, filepath)
+        _fsync_directory(osp.dirname(filepath) or ".")
+    except BaseException:
+        if osp.exists(temporary_filepath):
+            os.remove(temporary_filepath)
+        raise
+
+
+def _write_(filepath: str, content: str | bytes, atomic: bool = True) -> None:
+    with _atomic_open(filepath, "wb" if isinstance(content, bytes) else "w", atomic) as f:
+        f.write(content)
+
+
+def write_file_(filepath: str, content: str, atomic: bool = True) -> None:
+    _write_(filepath, content, atomic)
+
+
+def read_file_view(filepath: str) -> memoryview:
+    """
+    Read-only memoryview of a memory-mapped file, without copying it into a bytes object. Pages are
+    loaded lazily by the OS; the mapping lives as long as the view. Decode slices as needed, e.g.
+    str(view[:100], "utf-8").
+    """
+    with open(filepath, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(b"")
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
 
 
-def orjson_load(filepath: str) -> Sequence | Mapping:
+def orjson_load(filepath: str, memory_map: bool = False) -> Sequence | Mapping:
+    """With memory_map, orjson parses straight from a mapping of the file instead of a full copy."""
+    if memory_map:
+        with read_file_view(filepath) as view:
+            return orjson.loads(view)
     with open(filepath, "rb") as f:
         return orjson.loads(f.read())
 
 
-def orjson_save_(filepath: str, data: Sequence | Mapping, numpy: bool = False) -> None:
+def orjson_default(x: Any) -> Any:
+    """
+    default hook for orjson.dumps, so configurations serialize as they are, without converting them
+    to plain containers first: any Mapping, e.g. frozendict, MappingProxyType or DictConfig (with
+    interpolations resolved), any Sequence, e.g. ListConfig, sets, sorted when their items are
+    comparable, and paths. dicts, lists, tuples and dataclasses are handled by orjson natively.
+    """
+    if type(x).__module__.startswith("omegaconf."):
+        # one to_container call is cheaper than resolving DictConfig nodes level by level
+        from omegaconf import OmegaConf
+
+        return OmegaConf.to_container(x, resolve=True)
+    match x:
+        case Mapping():
+            return dict(x)
+        case Set():
+            try:
+                return sorted(x)
+            except TypeError:
+                return list(x)
+        case Sequence() if not isinstance(x, (str, bytes)):
+            return list(x)
+        case os.PathLike():
+            return os.fspath(x)
+        case _:
+            raise TypeError(f"Type is not JSON serializable: {type(x).__name__}")
+
+
+def _orjson_dumps(data: Sequence | Mapping, numpy: bool = False) -> bytes:
     option = orjson.OPT_APPEND_NEWLINE | orjson.OPT_INDENT_2
     if numpy:
         option |= orjson.OPT_SERIALIZE_NUMPY
-    os.makedirs(osp.dirname(filepath), exist_ok=True)
-    with open(filepath, "wb") as f:
-        f.write(orjson.dumps(data, option=option))
+    return orjson.dumps(data, default=orjson_default, option=option)
+
+
+def orjson_save_(
+    filepath: str, data: Sequence | Mapping, numpy: bool = False, atomic: bool = True
+) -> None:
+    _write_(filepath, _orjson_dumps(data, numpy), atomic)
+
+
+compression_suffixes = (".gz", ".xz", ".bz2", ".zst")
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("zstandard is required for .zst files: pip install zstandard") from e
+    return zstandard
+
+
+def _compression(filepath: str) -> str:
+    suffix = osp.splitext(filepath)[1]
+    return suffix if suffix in compression_suffixes else ""
+
+
+def _decompressing(f: IO[bytes], compression: str) -> IO[bytes]:
+    match compression:
+        case ".gz":
+            return gzip.GzipFile(fileobj=f, mode="rb")
+        case ".xz":
+            return lzma.LZMAFile(f, "rb")
+        case ".bz2":
+            return bz2.BZ2File(f, "rb")
+        case ".zst":
+            # files concatenated from several zstd frames, e.g. by appending, are read whole
+            decompressor = _zstandard().ZstdDecompressor()
+            return decompressor.stream_reader(f, read_across_frames=True, closefd=False)
+        case _:
+            return f
+
+
+def _compressing(f: IO[bytes], compression: str, level: int | None) -> IO[bytes]:
+    match compression:
+        case ".gz":
+            return gzip.GzipFile(fileobj=f, mode="wb", **_level_kwargs("compresslevel", level))
+        case ".xz":
+            return lzma.LZMAFile(f, "wb", **_level_kwargs("preset", level))
+        case ".bz2":
+            return bz2.BZ2File(f, "wb", **_level_kwargs("compresslevel", level))
+        case ".zst":
+            compressor = _zstandard().ZstdCompressor(**_level_kwargs("level", level))
+            return compressor.stream_writer(f, closefd=False)
+        case _:
+            return f
+
+
+def _level_kwargs(name: str, level: int | None) -> dict[str, int]:
+    return {} if level is None else {name: level}
+
+
+@contextmanager
+def open_compressed(
+    filepath: str, mode: Literal["rb", "wb"] = "rb", level: int | None = None, atomic: bool = True
+) -> Iterator[IO[bytes]]:
+    """
+    Binary stream over filepath that compresses or decompresses on the fly according to its
+    extension: .gz, .xz, .bz2 or .zst (with the zstandard package); other files are opened as is.
+    level is the codec's compression level (the preset for .xz), None for the codec's default.
+    Writes are atomic unless atomic=False.
+    """
+    compression = _compression(filepath)
+    with ExitStack() as stack:
+        if mode == "rb":
+            f = stack.enter_context(open(filepath, "rb"))
+            f = _decompressing(f, compression)
+        else:
+            f = stack.enter_context(_atomic_open(filepath, "wb", atomic))
+            f = _compressing(f, compression, level)
+        if compression:
+            stack.enter_context(f)
+        yield f
+
+
+artifact_alignment: int = 64
+_artifact_magic = b"ectools.artifact"
+
+
+def artifact_save_(filepath: str, data: Sequence | Mapping, atomic: bool = True) -> None:
+    """
+    Save a structure containing numpy arrays as JSON at filepath plus a binary sidecar at
+    filepath + ".bin". orjson writes the structure and the scalars, each array is replaced by a
+    reference to its raw bytes in the sidecar, stored contiguously and 64-byte aligned, in C order
+    or in Fortran order if it already is. Arrays of Python objects are not supported, and the key
+    "__ndarray__" is reserved for the references.
+    The JSON records the size of the sidecar and a random token also written in its header, so
+    artifact_load detects a sidecar from another save, e.g. after a crash between the two writes.
+    """
+    import numpy as np
+
+    arrays: list[np.ndarray] = []
+    offset = artifact_alignment
+
+    def default(x: Any) -> Any:
+        nonlocal offset
+        if isinstance(x, np.generic):
+            return x.item()
+        if not isinstance(x, np.ndarray):
+            return orjson_default(x)
+        if x.dtype.hasobject:
+            raise TypeError(f"cannot save an array of dtype {x.dtype} without pickling")
+        fortran_order = x.flags.f_contiguous and not x.flags.c_contiguous
+        arrays.append(x.T if fortran_order else np.ascontiguousarray(x))
+        reference = {
+            "offset": offset,
+            "dtype": np.lib.format.dtype_to_descr(x.dtype),
+            "shape": x.shape,
+            "fortran_order": fortran_order,
+        }
+        offset += -(-x.nbytes // artifact_alignment) * artifact_alignment
+        return {"__ndarray__": reference}
+
+    data_content = orjson.dumps(data, default=default)
+    # a key escaped inside a string never matches, so any extra match is a key of the data
+    if data_content.count(b'"__ndarray__":') != len(arrays):
+        raise ValueError('"__ndarray__" is reserved for arrays and cannot be a key of the data')
+    token = os.urandom(16)
+    header = {"token": token.hex(), "nbytes": offset}
+    content = orjson.dumps(
+        {"__artifact__": header, "data": orjson.Fragment(data_content)},
+        option=orjson.OPT_APPEND_NEWLINE,
+    )
+    with _atomic_open(f"{filepath}.bin", "wb", atomic) as f:
+        f.write((_artifact_magic + token).ljust(artifact_alignment, b"\0"))
+        for array in arrays:
+            f.write(array.data)
+            f.write(b"\0" * (-array.nbytes % artifact_alignment))
+    _write_(filepath, content, atomic)
+
+
+def artifact_load(
+    filepath: str, mmap_mode: Literal["r", "r+", "c"] | None = "r"
+) -> Sequence | Mapping:
+    """
+    Load what artifact_save_ saved. With mmap_mode, arrays are views of a memory map of the sidecar
+    and nothing is copied or read until used; with None, the sidecar is read into memory once.
+    Raises ValueError when the sidecar does not belong to the JSON.
+    """
+    import numpy as np
+
+    with open(filepath, "rb") as f:
+        document = orjson.loads(f.read())
+    header = document["__artifact__"]
+    blob_filepath = f"{filepath}.bin"
+    with open(blob_filepath, "rb") as f:
+        token = f.read(artifact_alignment)[len(_artifact_magic) :][:16]
+        nbytes = f.seek(0, os.SEEK_END)
+    if token.hex() != header["token"] or nbytes != header["nbytes"]:
+        raise ValueError(f"{blob_filepath} does not belong to {filepath}")
+    if mmap_mode is None:
+        blob = np.fromfile(blob_filepath, dtype=np.uint8)
+    else:
+        blob = np.memmap(blob_filepath, dtype=np.uint8, mode=mmap_mode)
+
+    def array(reference: Mapping) -> np.ndarray:
+        dtype = np.lib.format.descr_to_dtype(reference["dtype"])
+        shape = tuple(reference["shape"])
+        start = reference["offset"]
+        count = math.prod(shape)
+        x = blob[start : start + count * dtype.itemsize].view(dtype)
+        return x.reshape(shape[::-1]).T if reference["fortran_order"] else x.reshape(shape)
+
+    def resolved(x: Any) -> Any:
+        match x:
+            case {"__ndarray__": reference} if len(x) == 1:
+                return array(reference)
+            case dict():
+                return {k: resolved(v) for k, v in x.items()}
+            case list():
+                return [resolved(v) for v in x]
+            case _:
+                return x
+
+    return resolved(document["data"])
+
+
+jsonl_block_size: int = 2**24
+
+
+def _jsonl_iter(f: IO[bytes], block_size: int, truncated_ok: bool) -> Iterator[Any]:
+    carry = b""
+    while block := f.read(block_size):
+        lines = (carry + block).split(b"\n")
+        carry = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield orjson.loads(line)
+    if carry.strip():
+        try:
+            yield orjson.loads(carry)
+        except orjson.JSONDecodeError:
+            if not truncated_ok:
+                raise
+
+
+def jsonl_load_iter(
+    filepath: str, block_size: int = jsonl_block_size, truncated_ok: bool = False
+) -> Iterator[Any]:
+    """
+    Yield the documents of a JSON Lines file one by one, decompressing it on the fly if needed; see
+    open_compressed. The file is read in blocks of block_size bytes that are split on newlines, so
+    memory stays bounded by the block and the longest line. With truncated_ok, an unparsable last
+    line without a newline, as left by an interrupted writer, is skipped instead of raising.
+    """
+    with open_compressed(filepath) as f:
+        yield from _jsonl_iter(f, block_size, truncated_ok)
+
+
+def jsonl_load(
+    filepath: str, block_size: int = jsonl_block_size, truncated_ok: bool = False
+) -> list[Any]:
+    return list(jsonl_load_iter(filepath, block_size, truncated_ok))
+
+
+def _completed_last_line_(f) -> int:
+    # scans backwards from the end of a binary file opened for update: a last line without a
+    # newline is completed when it parses and truncated otherwise; returns the new size
+    size = end = f.seek(0, os.SEEK_END)
+    while end > 0:
+        start = max(0, end - 2**16)
+        f.seek(start)
+        newline = f.read(end - start).rfind(b"\n")
+        if newline >= 0:
+            end = start + newline + 1
+            break
+        end = start
+    if end < size:
+        f.seek(end)
+        try:
+            orjson.loads(f.read(size - end))
+        except orjson.JSONDecodeError:
+            f.truncate(end)
+        else:
+            end = size + f.write(b"\n")
+    f.seek(end)
+    return end
+
+
+class JsonlWriter:
+    """
+    Buffered JSON Lines writer on orjson. Lines are collected in memory and written every
+    flush_every lines or buffer_size bytes, whichever comes first, followed by an os.fsync when
+    fsync is set. With resume, an existing file is appended to after dropping a truncated last
+    line, e.g. one left by a killed job, or adding the newline a complete last line lacks;
+    otherwise the file is overwritten.
+    """
+
+    def __init__(
+        self,
+        filepath: str,
+        *,
+        resume: bool = False,
+        numpy: bool = False,
+        flush_every: int = 4096,
+        buffer_size: int = 2**22,
+        fsync: bool = False,
+    ):
+        os.makedirs(osp.dirname(filepath) or ".", exist_ok=True)
+        if resume and osp.exists(filepath):
+            self._file = open(filepath, "r+b")
+            _completed_last_line_(self._file)
+        else:
+            self._file = open(filepath, "wb")
+        self._option = orjson.OPT_APPEND_NEWLINE
+        if numpy:
+            self._option |= orjson.OPT_SERIALIZE_NUMPY
+        self._flush_every = flush_every
+        self._buffer_size = buffer_size
+        self._fsync = fsync
+        self._lines: list[bytes] = []
+        self._buffered_bytes = 0
+
+    def __enter__(self) -> "JsonlWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def write(self, data: Any) -> None:
+        line = orjson.dumps(data, default=orjson_default, option=self._option)
+        self._lines.append(line)
+        self._buffered_bytes += len(line)
+        if len(self._lines) >= self._flush_every or self._buffered_bytes >= self._buffer_size:
+            self.flush()
+
+    def write_many(self, data: Iterable[Any]) -> None:
+        for x in data:
+            self.write(x)
+
+    def flush(self) -> None:
+        if self._lines:
+            self._file.write(b"".join(self._lines))
+            self._lines.clear()
+            self._buffered_bytes = 0
+        self._file.flush()
+        if self._fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+
+def jsonl_save_(filepath: str, data: Iterable[Any], numpy: bool = False) -> None:
+    with JsonlWriter(filepath, numpy=numpy) as writer:
+        writer.write_many(data)
+
+
+class JsonArrayWriter:
+    """
+    Streaming counterpart of orjson_save_ for a top-level array: elements are encoded one at a
+    time and the output is byte for byte what orjson_save_ writes for the whole list. Writes are
+    buffered up to buffer_size bytes, compressed according to the extension and atomic; see
+    open_compressed. An exception inside the with block discards the file.
+    """
+
+    def __init__(
+        self,
+        filepath: str,
+        *,
+        numpy: bool = False,
+        buffer_size: int = 2**22,
+        level: int | None = None,
+        atomic: bool = True,
+    ):
+        self._stack = ExitStack()
+        self._file = self._stack.enter_context(open_compressed(filepath, "wb", level, atomic))
+        self._option = orjson.OPT_INDENT_2 | (orjson.OPT_SERIALIZE_NUMPY if numpy else 0)
+        self._buffer_size = buffer_size
+        self._pieces: list[bytes] = [b"["]
+        self._buffered_bytes = 0
+        self._num_elements = 0
+
+    def __enter__(self) -> "JsonArrayWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if exc_info[0] is None:
+            self.close()
+        else:
+            self._stack.__exit__(*exc_info)
+
+    def __len__(self) -> int:
+        return self._num_elements
+
+    def write(self, data: Any) -> None:
+        # orjson escapes newlines in strings, so indenting every line of an element is safe
+        piece = orjson.dumps(data, default=orjson_default, option=self._option)
+        piece = piece.replace(b"\n", b"\n  ")
+        self._pieces.append(b",\n  " if self._num_elements else b"\n  ")
+        self._pieces.append(piece)
+        self._num_elements += 1
+        self._buffered_bytes += len(piece)
+        if self._buffered_bytes >= self._buffer_size:
+            self.flush()
+
+    def write_many(self, data: Iterable[Any]) -> None:
+        for x in data:
+            self.write(x)
+
+    def flush(self) -> None:
+        self._file.write(b"".join(self._pieces))
+        self._pieces.clear()
+        self._buffered_bytes = 0
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self._pieces.append(b"\n]\n" if self._num_elements else b"]\n")
+        self.flush()
+        self._stack.close()
+
+
+_json_whitespace_pattern = re.compile(r"[ \t\n\r]*")
+
+
+def json_array_load_iter(filepath: str, block_size: int = jsonl_block_size) -> Iterator[Any]:
+    """
+    Yield the elements of a file holding one JSON array, without parsing the whole document. The
+    file is read in blocks and decompressed on the fly if needed, and elements are parsed one at a
+    time with the incremental raw_decode of the json module's C scanner, as orjson only parses
+    whole documents, so memory stays bounded by the block and the largest element.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    skip_whitespace = _json_whitespace_pattern.match
+    with open_compressed(filepath) as f:
+        buffer, position, eof = "", 0, False
+
+        def read_more() -> None:
+            nonlocal buffer, position, eof
+            if eof:
+                raise ValueError(f"{filepath} ends inside its JSON array")
+            block = f.read(block_size)
+            eof = not block
+            buffer = buffer[position:] + text_decoder.decode(block, final=eof)
+            position = 0
+
+        while (position := skip_whitespace(buffer, position).end()) == len(buffer):
+            read_more()
+        if buffer[position] != "[":
+            raise ValueError(f"{filepath} does not hold a JSON array")
+        position += 1
+        while (position := skip_whitespace(buffer, position).end()) == len(buffer):
+            read_more()
+        if buffer[position] == "]":
+            return
+        while True:
+            # an element that parses up to the end of the buffer or is not followed by a delimiter
+            # may be a number cut by the end of the block: parse it again with the next block
+            position = skip_whitespace(buffer, position).end()
+            try:
+                x, end = decoder.raw_decode(buffer, position)
+                end = skip_whitespace(buffer, end).end()
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = len(buffer)
+            if end == len(buffer) or buffer[end] not in ",]" and not eof:
+                read_more()
+                continue
+            if buffer[end] not in ",]":
+                raise ValueError(f"{filepath}: expected ',' or ']' after an element of the array")
+            yield x
+            if buffer[end] == "]":
+                return
+            position = end + 1
 
 
 def json_load(filepath: str, **kwargs) -> Sequence | Mapping:
@@ -41,19 +597,718 @@ def json_save_(
     data: Sequence | Mapping,
     indent: int | None = None,
     sort_keys: bool = False,
+    atomic: bool = True,
     **kwargs,
 ) -> None:
-    os.makedirs(osp.dirname(filepath), exist_ok=True)
-    with open(filepath, "w") as f:
-        json.dump(data, f, indent=indent, sort_keys=sort_keys, **kwargs)
+    _write_(filepath, json.dumps(data, indent=indent, sort_keys=sort_keys, **kwargs), atomic)
 
 
 def yaml_load(filepath: str) -> Sequence | Mapping:
     with open(filepath, "r") as f:
-        return yaml.safe_load(f)
+        return yaml.load(f, Loader=YamlSafeLoader)
+
+
+def yaml_save_(filepath: str, data: Sequence | Mapping, atomic: bool = True, **kwargs) -> None:
+    _write_(filepath, yaml.dump(data, Dumper=YamlSafeDumper, **kwargs), atomic)
+
+
+_parse_cache: dict[tuple[str, Callable[[str], Any]], tuple[tuple[int, int], Any]] = {}
+
 
+def _deepfrozen(x: Any) -> Any:
+    # frozendict.deepfreeze is an order of magnitude slower on the plain dicts and lists of parsers
+    match x:
+        case dict():
+            return frozendict({k: _deepfrozen(v) for k, v in x.items()})
+        case list():
+            return tuple(map(_deepfrozen, x))
+        case str() | bytes() | int() | float() | None:
+            return x
+        case _:
+            return deepfreeze(x)
 
-def yaml_save_(filepath: str, data: Sequence | Mapping, **kwargs) -> None:
-    os.makedirs(osp.dirname(filepath), exist_ok=True)
+
+def parse_cached(
+    filepath: str,
+    parse: Callable[[str], Any],
+    cache_dirpath: str | None = None,
+    name: str | None = None,
+) -> Any:
+    """
+    parse(filepath), memoized per process on the path, mtime and size of the file and the parse
+    object itself, so unchanged files are parsed once. The result is deep-frozen, since it is
+    shared between callers. With cache_dirpath, the parsed content is also pickled there, which is
+    much faster to load than YAML, so other processes skip the parse as well; name then identifies
+    parse across processes and is required, e.g. "ectools.io.yaml_load".
+    """
+    if cache_dirpath is not None and not name:
+        raise ValueError("parse_cached needs the name of parse to cache it in cache_dirpath")
+    filepath = osp.abspath(filepath)
+    stat = os.stat(filepath)
+    key = (filepath, parse)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _parse_cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    data, found = None, False
+    if cache_dirpath is not None:
+        digest = hashlib.sha256(repr((filepath, name, version)).encode()).hexdigest()
+        pickle_filepath = osp.join(cache_dirpath, f"{digest}.pickle")
+        try:
+            with open(pickle_filepath, "rb") as f:
+                data, found = pickle.load(f), True
+        except Exception:
+            # a missing, partial or stale pickle, e.g. of a class since renamed, is parsed again
+            pass
+    if not found:
+        data = parse(filepath)
+        if cache_dirpath is not None:
+            _write_(pickle_filepath, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+    data = _deepfrozen(data)
+    _parse_cache[key] = (version, data)
+    return data
+
+
+def parse_cache_clear_() -> None:
+    _parse_cache.clear()
+
+
+def yaml_load_cached(filepath: str, cache_dirpath: str | None = None) -> Sequence | Mapping:
+    """yaml_load through parse_cached; the result is frozen"""
+    return parse_cached(filepath, yaml_load, cache_dirpath, "ectools.io.yaml_load")
+
+
+def _format(filepath: str) -> str:
+    compression = _compression(filepath)
+    return osp.splitext(filepath[: len(filepath) - len(compression)])[1]
+
+
+def load(filepath: str) -> Any:
+    """
+    Load a .json, .jsonl, .yaml or .yml file, optionally compressed; see open_compressed. JSON Lines
+    and YAML are parsed from the decompressing stream, while a JSON document is decompressed whole
+    before orjson parses it. Use jsonl_load_iter to avoid materialising a JSON Lines file.
+    """
+    file_format = _format(filepath)
+    with open_compressed(filepath) as f:
+        match file_format:
+            case ".json":
+                return orjson.loads(f.read())
+            case ".jsonl":
+                return list(_jsonl_iter(f, jsonl_block_size, truncated_ok=False))
+            case ".yaml" | ".yml":
+                return yaml.load(f, Loader=YamlSafeLoader)
+            case _:
+                raise ValueError(f"Unknown format {file_format!r} of {filepath}")
+
+
+def save_(
+    filepath: str,
+    data: Any,
+    level: int | None = None,
+    atomic: bool = True,
+    numpy: bool = False,
+    **kwargs,
+) -> None:
+    """
+    Save data as .json, .jsonl (an iterable of documents) or .yaml/.yml according to the extension
+    of filepath, compressed on the fly with the given level for .gz, .xz, .bz2 and .zst; see
+    open_compressed. numpy applies to JSON and JSON Lines, kwargs go to yaml.dump.
+    """
+    file_format = _format(filepath)
+    if file_format not in (".json", ".jsonl", ".yaml", ".yml"):
+        raise ValueError(f"Unknown format {file_format!r} of {filepath}")
+    with open_compressed(filepath, "wb", level, atomic) as f:
+        match file_format:
+            case ".json":
+                f.write(_orjson_dumps(data, numpy))
+            case ".jsonl":
+                option = orjson.OPT_APPEND_NEWLINE | (orjson.OPT_SERIALIZE_NUMPY if numpy else 0)
+                for batch in itertools.batched(data, 4096):
+                    lines = (orjson.dumps(x, default=orjson_default, option=option) for x in batch)
+                    f.write(b"".join(lines))
+            case _:
+                yaml.dump(data, f, Dumper=YamlSafeDumper, encoding="utf-8", **kwargs)
+
+
+class LoadResult(NamedTuple):
+    filepath: str
+    data: Any
+    error: BaseException | None
+    num_bytes: int
+    seconds: float
+
+
+class BulkLoadStats:
+    """Throughput of a bulk_load_iter call, updated as its results are consumed"""
+
+    def __init__(self):
+        self.num_files = 0
+        self.num_errors = 0
+        self.num_bytes = 0
+        self.load_seconds = 0.0
+        self.start = time.perf_counter()
+        self.stop = self.start
+
+    def add(self, result: LoadResult) -> None:
+        self.num_files += 1
+        self.num_errors += result.error is not None
+        self.num_bytes += result.num_bytes
+        self.load_seconds += result.seconds
+        self.stop = time.perf_counter()
+
+    @property
+    def seconds(self) -> float:
+        return self.stop - self.start
+
+    @property
+    def files_per_second(self) -> float:
+        return self.num_files / max(self.seconds, 1e-9)
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.num_bytes / max(self.seconds, 1e-9)
+
+    def __repr__(self) -> str:
+        return (
+            f"BulkLoadStats({self.num_files} files, {self.num_errors} errors, "
+            f"{self.num_bytes / 2**20:.1f} MiB in {self.seconds:.3f} s, "
+            f"{self.files_per_second:.1f} files/s, {self.bytes_per_second / 2**20:.1f} MiB/s, "
+            f"{self.load_seconds / max(self.seconds, 1e-9):.1f}x concurrency)"
+        )
+
+
+def _load_result(filepath: str, loader: Callable[[str], Any]) -> LoadResult:
+    start = time.perf_counter()
+    try:
+        data, error = loader(filepath), None
+        num_bytes = osp.getsize(filepath)
+    except Exception as e:
+        data, error, num_bytes = None, e, 0
+    return LoadResult(filepath, data, error, num_bytes, time.perf_counter() - start)
+
+
+def bulk_load_iter(
+    filepaths: Iterable[str] | str,
+    loader: Callable[[str], Any] = load,
+    max_workers: int = 32,
+    ordered: bool = False,
+    stats: BulkLoadStats | None = None,
+) -> Iterator[LoadResult]:
+    """
+    Load many files concurrently on a thread pool, which hides the per-file latency of network
+    filesystems. filepaths is an iterable of paths or a recursive glob pattern. Results come as
+    they finish, or in input order with ordered; at most 2 * max_workers loads are in flight, so
+    long inputs are consumed lazily. Errors are captured per file in LoadResult.error; stats, if
+    given, is updated with every result.
+    """
+    if isinstance(filepaths, str):
+        filepaths = sorted(glob.glob(filepaths, recursive=True))
+    filepaths = iter(filepaths)
+    max_in_flight = 2 * max_workers
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight: deque[Future[LoadResult]] = deque()
+
+        def submit(filepath: str) -> None:
+            in_flight.append(executor.submit(_load_result, filepath, loader))
+
+        for filepath in itertools.islice(filepaths, max_in_flight):
+            submit(filepath)
+        while in_flight:
+            if ordered:
+                done = [in_flight.popleft()]
+            else:
+                done = wait(in_flight, return_when=FIRST_COMPLETED).done
+                for future in done:
+                    in_flight.remove(future)
+            for future in done:
+                result = future.result()
+                if stats is not None:
+                    stats.add(result)
+                for filepath in itertools.islice(filepaths, 1):
+                    submit(filepath)
+                yield result
+
+
+def bulk_load(
+    filepaths: Iterable[str] | str,
+    loader: Callable[[str], Any] = load,
+    max_workers: int = 32,
+    stats: BulkLoadStats | None = None,
+) -> list[LoadResult]:
+    """bulk_load_iter in input order, collected"""
+    return list(bulk_load_iter(filepaths, loader, max_workers, ordered=True, stats=stats))
+
+
+class BackgroundWriter:
+    """
+    Write-behind saves on a background thread, so a training loop does not stall on disk I/O.
+    Data is serialized in the calling thread, so later mutations do not leak into the file, and
+    only the bytes are queued. Saves to a path that is still queued replace the queued content,
+    and at most max_pending distinct paths are queued before callers block. Errors from the
+    thread are raised by the next call. flush waits for everything queued; close also stops the
+    thread and runs at exit if it was not called.
+    """
+
+    def __init__(self, max_pending: int = 64, atomic: bool = True):
+        self._max_pending = max_pending
+        self._atomic = atomic
+        self._pending: dict[str, str | bytes] = {}
+        self._writing = 0
+        self._error: BaseException | None = None
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="BackgroundWriter", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def __enter__(self) -> "BackgroundWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                filepath = next(iter(self._pending))
+                content = self._pending.pop(filepath)
+                self._writing += 1
+                self._condition.notify_all()
+            try:
+                _write_(filepath, content, self._atomic)
+            except BaseException as e:
+                with self._condition:
+                    self._error = self._error or e
+            finally:
+                with self._condition:
+                    self._writing -= 1
+                    self._condition.notify_all()
+
+    def write_(self, filepath: str, content: str | bytes) -> None:
+        with self._condition:
+            self._raise_error()
+            if self._closed:
+                raise ValueError("BackgroundWriter is closed")
+            while filepath not in self._pending and len(self._pending) >= self._max_pending:
+                self._condition.wait()
+            self._pending[filepath] = content
+            self._condition.notify_all()
+
+    def write_file_(self, filepath: str, content: str) -> None:
+        self.write_(filepath, content)
+
+    def orjson_save_(self, filepath: str, data: Sequence | Mapping, numpy: bool = False) -> None:
+        self.write_(filepath, _orjson_dumps(data, numpy))
+
+    def json_save_(
+        self,
+        filepath: str,
+        data: Sequence | Mapping,
+        indent: int | None = None,
+        sort_keys: bool = False,
+        **kwargs,
+    ) -> None:
+        self.write_(filepath, json.dumps(data, indent=indent, sort_keys=sort_keys, **kwargs))
+
+    def yaml_save_(self, filepath: str, data: Sequence | Mapping, **kwargs) -> None:
+        self.write_(filepath, yaml.dump(data, Dumper=YamlSafeDumper, **kwargs))
+
+    def flush(self) -> None:
+        with self._condition:
+            while self._pending or self._writing:
+                self._condition.wait()
+            self._raise_error()
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        atexit.unregister(self.close)
+        with self._condition:
+            self._raise_error()
+
+
+def _test_artifact(dirname: str) -> None:
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    arrays = [
+        rng.standard_normal((3, 4)),
+        np.asfortranarray(rng.standard_normal((5, 2, 3)).astype(np.float32)),
+        np.arange(10)[::3],
+        np.zeros((0, 4)),
+        np.array(5),
+        np.array([(1, 2.0)], dtype=[("a", "i4"), ("b", "f8")]),
+        np.array(["ab", "c"]),
+    ]
+    data = {"name": "x", "lr": np.float32(0.5), "arrays": arrays}
+    filepath = osp.join(dirname, "artifact", "bundle.json")
+    artifact_save_(filepath, data)
+    for mmap_mode in ("r", None, "c"):
+        loaded = artifact_load(filepath, mmap_mode)
+        assert loaded["name"] == "x" and loaded["lr"] == 0.5
+        for x, y in zip(arrays, loaded["arrays"], strict=True):
+            assert x.dtype == y.dtype and np.array_equal(x, y), f"{mmap_mode}: {x} != {y}"
+    artifact_save_(osp.join(dirname, "artifact", "empty.json"), {"x": 1})
+    assert artifact_load(osp.join(dirname, "artifact", "empty.json")) == {"x": 1}
+
+    # user mappings that use the reserved key would load as arrays
+    reference = {"offset": 0, "dtype": "<f8", "shape": [2], "fortran_order": False}
+    for meta in ({"__ndarray__": reference}, {"a": 1, "__ndarray__": 2}, [{"__ndarray__": 3}]):
+        try:
+            artifact_save_(filepath, {"meta": meta, "x": np.ones(2)})
+            raise AssertionError("the reserved key was saved")
+        except ValueError:
+            pass
+    data = {"meta": ['{"__ndarray__": 1}', {"__ndarray": 2}], "x": np.ones(2)}
+    artifact_save_(filepath, data)
+    loaded = artifact_load(filepath)
+    assert loaded["meta"] == data["meta"] and np.array_equal(loaded["x"], data["x"])
+
+    # a crash between the two replacements leaves the old JSON next to a new sidecar
+    old_content = read_file(filepath)
+    artifact_save_(filepath, {"y": np.ones(len(arrays))})
+    write_file_(filepath, old_content)
+    try:
+        artifact_load(filepath)
+        raise AssertionError("a mismatched sidecar was loaded")
+    except ValueError:
+        pass
+
+
+def _test_orjson_load(dirname: str) -> None:
+    filepath = osp.join(dirname, "orjson", "data.json")
+    data = {"a": [1, 2.5, None], "b": "é€😀", "c": {"d": True}}
+    orjson_save_(filepath, data)
+    assert orjson_load(filepath) == orjson_load(filepath, memory_map=True) == data
+    with read_file_view(filepath) as view:
+        assert view.readonly and bytes(view) == read_file(filepath).encode()
+    write_file_(filepath, "")
+    assert len(read_file_view(filepath)) == 0
+
+
+def _test_jsonl(dirname: str) -> None:
+    filepath = osp.join(dirname, "jsonl", "data.jsonl")
+    data = [{"i": i, "text": "x" * (i % 7)} for i in range(100)]
+    with JsonlWriter(filepath, flush_every=7) as writer:
+        writer.write_many(data[:50])
+    for block_size in (1, 3, 1000):
+        assert jsonl_load(filepath, block_size) == data[:50]
+    # a killed job left half a line: it is skipped on load and dropped on resume
+    with open(filepath, "ab") as f:
+        f.write(b'{"i": 50, "te')
+    try:
+        jsonl_load(filepath)
+        raise AssertionError("a truncated last line was loaded")
+    except orjson.JSONDecodeError:
+        pass
+    assert jsonl_load(filepath, truncated_ok=True) == data[:50]
+    with JsonlWriter(filepath, resume=True) as writer:
+        writer.write_many(data[50:75])
+    assert jsonl_load(filepath) == data[:75]
+    # a complete last line that only lacks its newline is kept on resume
+    with open(filepath, "r+b") as f:
+        f.truncate(f.seek(0, os.SEEK_END) - 1)
+    with JsonlWriter(filepath, resume=True) as writer:
+        writer.write_many(data[75:])
+    assert jsonl_load(filepath) == data
+    with open_compressed(filepath + ".gz", "wb") as f:
+        f.write(read_file_view(filepath))
+    assert list(jsonl_load_iter(filepath + ".gz", 5)) == data
+
+
+def _random_json(rng, depth: int = 0) -> Any:
+    kind = rng.randrange(8 if depth < 3 else 5)
+    if kind == 0:
+        return rng.choice([None, True, False])
+    if kind == 1:
+        return rng.randint(-(10**12), 10**12)
+    if kind == 2:
+        return rng.uniform(-1e6, 1e6) * 10 ** rng.randint(-20, 20)
+    if kind in (3, 4):
+        return "".join(rng.choice('ab \n\t"\\/é€😀\x00') for _ in range(rng.randrange(12)))
+    if kind in (5, 6):
+        return [_random_json(rng, depth + 1) for _ in range(rng.randrange(5))]
+    return {f"k{i}": _random_json(rng, depth + 1) for i in range(rng.randrange(5))}
+
+
+def _test_json_array(dirname: str) -> None:
+    import random
+
+    rng = random.Random(0)
+    for trial in range(20):
+        data = [_random_json(rng) for _ in range(rng.randrange(30))]
+        for suffix in ("", ".gz"):
+            filepath = osp.join(dirname, "json_array", f"{trial}.json{suffix}")
+            with JsonArrayWriter(filepath, buffer_size=rng.choice([1, 100, 2**22])) as writer:
+                writer.write_many(data)
+            assert len(writer) == len(data)
+            if not suffix:
+                orjson_save_(filepath + ".orjson", data)
+                assert read_file(filepath) == read_file(filepath + ".orjson")
+            for block_size in (1, 2, 3, 7, 1000):
+                assert list(json_array_load_iter(filepath, block_size)) == data
+    filepath = osp.join(dirname, "json_array", "truncated.json")
     with open(filepath, "w") as f:
-        yaml.safe_dump(data, f, **kwargs)
+        f.write('[1, {"a": [2, 3]}, -2.5')
+    for block_size in (1, 7, 1000):
+        try:
+            list(json_array_load_iter(filepath, block_size))
+            raise AssertionError("a truncated array was loaded")
+        except ValueError:
+            pass
+    try:
+        with JsonArrayWriter(filepath) as writer:
+            writer.write(1)
+            raise KeyboardInterrupt
+    except KeyboardInterrupt:
+        pass
+    assert (
+        read_file(filepath) == '[1, {"a": [2, 3]}, -2.5'
+    ), "an interrupted writer replaced the file"
+
+
+def _test_atomic_save(dirname: str) -> None:
+    dirpath = osp.join(dirname, "atomic")
+    filepath = osp.join(dirpath, "data.yaml")
+    yaml_save_(filepath, {"a": 1})
+    for save in (yaml_save_, save_):
+        try:
+            save(filepath, {"b": object()})
+        except yaml.YAMLError:
+            pass
+        else:
+            raise AssertionError("an unserializable structure was saved")
+        assert yaml_load(filepath) == {"a": 1}, "a failed save replaced the file"
+    json_save_(filepath, {"c": 3}, atomic=False)
+    assert os.listdir(dirpath) == ["data.yaml"], "a temporary file was left behind"
+    assert json_load(filepath) == {"c": 3}
+
+    # saves write through symlinks and keep the permissions of the file they replace
+    os.chmod(filepath, 0o600)
+    link_filepath = osp.join(dirname, "atomic_link.yaml")
+    os.symlink(filepath, link_filepath)
+    for atomic in (True, False):
+        yaml_save_(link_filepath, {"d": atomic}, atomic=atomic)
+        assert osp.islink(link_filepath) and yaml_load(filepath) == {"d": atomic}
+        assert os.stat(filepath).st_mode & 0o777 == 0o600
+    assert sorted(os.listdir(dirpath)) == ["data.yaml"]
+
+
+def _test_parse_cached(dirname: str) -> None:
+    import functools
+
+    filepath = osp.join(dirname, "parse_cached", "data.yaml")
+    cache_dirpath = osp.join(dirname, "parse_cached", "cache")
+    yaml_save_(filepath, {"a": [1, {"b": 2}]})
+    data = yaml_load_cached(filepath, cache_dirpath)
+    assert data == {"a": (1, {"b": 2})} and isinstance(data, frozendict)
+    assert yaml_load_cached(filepath, cache_dirpath) is data
+    # other processes find the pickle, and a corrupt one is parsed again
+    (pickle_filename,) = os.listdir(cache_dirpath)
+    for content in (None, b"", b"\x80\x05corrupt", b"cectools.io\n_missing\n."):
+        parse_cache_clear_()
+        if content is not None:
+            _write_(osp.join(cache_dirpath, pickle_filename), content)
+        assert yaml_load_cached(filepath, cache_dirpath) == data
+    # parsers are told apart in the process by identity and across processes by name
+    parse_cache_clear_()
+    first, second = (lambda f: "first"), (lambda f: "second")
+    assert parse_cached(filepath, first) == "first" and parse_cached(filepath, second) == "second"
+    for name, parse in (("first", first), ("second", second), ("first", second)):
+        parse_cache_clear_()
+        assert parse_cached(filepath, parse, cache_dirpath, name) == name
+    parsed = parse_cached(filepath, functools.partial(yaml_load), cache_dirpath, "partial")
+    assert parsed == data
+    try:
+        parse_cached(filepath, yaml_load, cache_dirpath)
+        raise AssertionError("an unnamed parser was cached on disk")
+    except ValueError:
+        pass
+    # a modified file is parsed again
+    yaml_save_(filepath, {"a": 3, "c": 4})
+    os.utime(filepath, ns=(0, 0))
+    assert yaml_load_cached(filepath, cache_dirpath) == {"a": 3, "c": 4}
+
+
+def _test_load_save(dirname: str) -> None:
+    try:
+        _zstandard()
+        suffixes = ("", *compression_suffixes)
+    except ImportError:
+        print("zstandard is not installed: skipping the .zst tests")
+        suffixes = tuple(suffix for suffix in ("", *compression_suffixes) if suffix != ".zst")
+    data = [{"i": i, "text": "é" * i, "values": [i / 3, None, True]} for i in range(50)]
+    for file_format in (".json", ".jsonl", ".yaml", ".yml"):
+        for suffix in suffixes:
+            filepath = osp.join(dirname, "load_save", f"data{file_format}{suffix}")
+            save_(filepath, iter(data) if file_format == ".jsonl" else data, level=1)
+            assert load(filepath) == data
+            if suffix:
+                with open(filepath, "rb") as f:
+                    assert f.read(1) not in b"[{-", "the file was not compressed"
+    for suffix in suffixes:
+        # concatenated streams, e.g. appended JSON Lines, are read to the end
+        filepath = osp.join(dirname, "load_save", f"appended.jsonl{suffix}")
+        with open(filepath + ".part", "wb") as f:
+            for part in (data[:20], data[20:]):
+                save_(filepath, part)
+                f.write(read_file_view(filepath))
+        os.replace(filepath + ".part", filepath)
+        assert load(filepath) == data == jsonl_load(filepath)
+    try:
+        save_(osp.join(dirname, "load_save", "data.txt"), data)
+        raise AssertionError("an unknown format was saved")
+    except ValueError:
+        pass
+
+
+def _test_bulk_load(dirname: str) -> None:
+    filepaths = [osp.join(dirname, "bulk", f"{i // 10}", f"{i}.json") for i in range(100)]
+    for i, filepath in enumerate(filepaths):
+        orjson_save_(filepath, {"i": i})
+    write_file_(filepaths[7], "{")
+    os.remove(filepaths[8])
+    stats = BulkLoadStats()
+    results = bulk_load(filepaths, max_workers=4, stats=stats)
+    assert [result.filepath for result in results] == filepaths
+    for i, result in enumerate(results):
+        if i in (7, 8):
+            assert result.data is None and result.error is not None and result.num_bytes == 0
+        else:
+            assert result.data == {"i": i} and result.error is None and result.num_bytes > 0
+    assert isinstance(results[7].error, orjson.JSONDecodeError)
+    assert isinstance(results[8].error, FileNotFoundError)
+    assert (stats.num_files, stats.num_errors) == (100, 2)
+    assert stats.num_bytes == sum(result.num_bytes for result in results)
+    # unordered, from a glob pattern that finds the 99 remaining files
+    pattern = osp.join(dirname, "bulk", "**", "*.json")
+    results = list(bulk_load_iter(pattern, orjson_load, max_workers=3))
+    assert sorted(result.filepath for result in results) == sorted(filepaths[:8] + filepaths[9:])
+
+
+def _test_orjson_default(dirname: str) -> None:
+    import dataclasses
+    import pathlib
+    import types
+
+    @dataclasses.dataclass
+    class Layer:
+        width: int
+        activations: tuple[str, ...]
+
+    filepath = osp.join(dirname, "orjson_default", "config.json")
+    data = {
+        "frozen": deepfreeze({"a": {"b": [1, 2]}}),
+        "proxy": types.MappingProxyType({"c": 3}),
+        "set": {3, 1, 2},
+        "path": pathlib.Path("a", "b.txt"),
+        "layer": Layer(8, ("relu",)),
+    }
+    expected = {
+        "frozen": {"a": {"b": [1, 2]}},
+        "proxy": {"c": 3},
+        "set": [1, 2, 3],
+        "path": osp.join("a", "b.txt"),
+        "layer": {"width": 8, "activations": ["relu"]},
+    }
+    try:
+        from omegaconf import OmegaConf
+
+        data["config"] = OmegaConf.create({"x": 1, "y": "${x}", "z": [{"w": "${x}"}]})
+        expected["config"] = {"x": 1, "y": 1, "z": [{"w": 1}]}
+    except ImportError:
+        print("omegaconf is not installed: skipping the DictConfig tests")
+    orjson_save_(filepath, data)
+    assert orjson_load(filepath) == expected
+    assert sorted(orjson.loads(orjson.dumps({1, "a"}, default=orjson_default)), key=str) == [1, "a"]
+    try:
+        orjson.dumps(object(), default=orjson_default)
+        raise AssertionError("an object was serialized")
+    except TypeError:
+        pass
+
+
+def _test_background_writer(dirname: str) -> None:
+    global _write_
+    write_, gate, started = _write_, threading.Event(), threading.Event()
+
+    def gated_write_(filepath: str, content: str | bytes, atomic: bool = True) -> None:
+        started.set()
+        gate.wait()
+        write_(filepath, content, atomic)
+
+    filepaths = [osp.join(dirname, "background", f"{i}.txt") for i in range(4)]
+    _write_ = gated_write_
+    try:
+        writer = BackgroundWriter(max_pending=2)
+        writer.write_(filepaths[0], "0")
+        assert started.wait(5), "the writer thread did not start writing"
+        # the thread is stuck on the first file: saves to a queued path are coalesced
+        writer.write_(filepaths[1], "a")
+        writer.write_(filepaths[1], "b")
+        writer.write_file_(filepaths[2], "c")
+        assert writer._pending == {filepaths[1]: "b", filepaths[2]: "c"}
+        # and a third queued path waits for room
+        blocked = threading.Thread(target=writer.write_, args=(filepaths[3], "d"))
+        blocked.start()
+        blocked.join(0.2)
+        assert blocked.is_alive(), "max_pending did not block the caller"
+        gate.set()
+        blocked.join(5)
+        writer.flush()
+        assert [read_file(filepath) for filepath in filepaths] == ["0", "b", "c", "d"]
+    finally:
+        _write_ = write_
+        gate.set()
+
+    for close in (writer.flush, writer.close):
+        writer.write_(osp.join(filepaths[0], "not_a_directory.txt"), "x")
+        try:
+            close()
+            raise AssertionError(f"{close.__name__} did not raise the error of the thread")
+        except OSError:
+            pass
+    writer.close()
+    try:
+        writer.write_(filepaths[0], "x")
+        raise AssertionError("a closed writer accepted a save")
+    except ValueError:
+        pass
+    with BackgroundWriter() as writer:
+        writer.orjson_save_(filepaths[0], {"a": 1})
+    assert orjson_load(filepaths[0]) == {"a": 1}
+
+
+def _test() -> None:
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as dirname:
+        _test_orjson_load(dirname)
+        _test_jsonl(dirname)
+        _test_json_array(dirname)
+        _test_atomic_save(dirname)
+        _test_parse_cached(dirname)
+        _test_load_save(dirname)
+        _test_bulk_load(dirname)
+        _test_orjson_default(dirname)
+        _test_background_writer(dirname)
+        _test_artifact(dirname)
+    print("All io tests passed.")
+
+
+# python -m src.ectools.io
+if __name__ == "__main__":
+    _test()
@@ -1,6 +1,9 @@
 import secrets
+from collections.abc import Mapping
+from functools import partial as prt
 
 import jax
+import numpy as np
 from jax import Array
 
 
@@ -8,3 +11,120 @@ def jax_prng_key(random_seed: int | Array | None) -> Array:
     if isinstance(random_seed, Array):
         return random_seed
     return jax.random.key(secrets.randbits(64) if random_seed is None else random_seed)
+
+
+@prt(jax.jit, static_argnames="num")
+def _split_block_data(key: Array, block: int | Array, num: int) -> Array:
+    return jax.random.key_data(jax.random.split(jax.random.fold_in(key, block), num))
+
+
+class JaxPrngKeyStream:
+    """
+    Keys split ahead of time in jitted blocks of `block_size` and handed out one at a time or in
+    blocks, instead of calling jax.random.split at every step.
+    Block b is split from fold_in(root, b), so the stream is determined by the root key and the
+    position, which is all that state_dict records for resuming at exactly the same key.
+    """
+
+    def __init__(self, random_seed: int | Array | None, block_size: int = 1024, position: int = 0):
+        if block_size <= 0:
+            raise ValueError(f"block_size must be positive, got {block_size}")
+        if position < 0:
+            raise ValueError(f"position must be non-negative, got {position}")
+        root = jax_prng_key(random_seed)
+        if not jax.dtypes.issubdtype(root.dtype, jax.dtypes.prng_key):
+            root = jax.random.wrap_key_data(root)
+        self._root = root
+        self._impl = str(jax.random.key_impl(root))
+        self._block_size = block_size
+        self._position = position
+        self._block_index = -1
+        self._block_data = np.empty((0, *jax.random.key_data(root).shape), dtype=np.uint32)
+
+    def __repr__(self) -> str:
+        return f"JaxPrngKeyStream(position {self._position}, blocks of {self._block_size})"
+
+    def __iter__(self) -> "JaxPrngKeyStream":
+        return self
+
+    def __next__(self) -> Array:
+        return self.take(None)
+
+    @property
+    def position(self) -> int:
+        return self._position
+
+    def _host_block_data(self, block_index: int) -> np.ndarray:
+        if block_index != self._block_index:
+            self._block_data = np.asarray(
+                _split_block_data(self._root, block_index, self._block_size)
+            )
+            self._block_index = block_index
+        return self._block_data
+
+    def take(self, n: int | None) -> Array:
+        """`n` keys as an array of shape (n,), or a single key if `n` is None"""
+        if n is not None and n < 0:
+            raise ValueError(f"Cannot take a negative number of keys, got {n}")
+        count = 1 if n is None else n
+        pieces = [self._block_data[:0]]
+        while count > 0:
+            block_index, start = divmod(self._position, self._block_size)
+            stop = min(start + count, self._block_size)
+            pieces.append(self._host_block_data(block_index)[start:stop])
+            self._position += stop - start
+            count -= stop - start
+        data = np.concatenate(pieces) if len(pieces) > 2 else pieces[-1]
+        return jax.random.wrap_key_data(data[0] if n is None else data, impl=self._impl)
+
+    def state_dict(self) -> Mapping:
+        return {
+            "key_data": np.asarray(jax.random.key_data(self._root)).tolist(),
+            "impl": self._impl,
+            "block_size": self._block_size,
+            "position": self._position,
+        }
+
+    @classmethod
+    def from_state_dict(cls, state: Mapping) -> "JaxPrngKeyStream":
+        data = np.asarray(state["key_data"], dtype=np.uint32)
+        root = jax.random.wrap_key_data(data, impl=state["impl"])
+        return cls(root, block_size=state["block_size"], position=state["position"])
+
+
+def _test() -> None:
+    def same(a: Array, b: Array) -> bool:
+        return bool(np.array_equal(jax.random.key_data(a), jax.random.key_data(b)))
+
+    stream = JaxPrngKeyStream(0, block_size=8)
+    singles = [next(stream) for _ in range(11)]
+    assert stream.position == 11
+    block = JaxPrngKeyStream(0, block_size=8).take(11)
+    assert block.shape == (11,) and all(same(block[i], singles[i]) for i in range(11))
+    assert len({tuple(np.asarray(jax.random.key_data(k)).tolist()) for k in singles}) == 11
+
+    state = stream.state_dict()
+    ahead = stream.take(20)
+    resumed = JaxPrngKeyStream.from_state_dict(state)
+    assert same(resumed.take(20), ahead), "resumed stream diverged"
+
+    legacy = JaxPrngKeyStream(jax.random.PRNGKey(0), block_size=4)
+    assert same(legacy.take(3), JaxPrngKeyStream(jax.random.key(0), block_size=4).take(3))
+    assert jax.random.normal(next(legacy), (2,)).shape == (2,)
+
+    empty = legacy.take(0)
+    assert empty.shape == (0,) and jax.dtypes.issubdtype(empty.dtype, jax.dtypes.prng_key)
+    assert legacy.position == 4 and same(legacy.take(2), JaxPrngKeyStream(0, 4, 4).take(2))
+    for make in (lambda: legacy.take(-1), lambda: JaxPrngKeyStream(0, position=-1)):
+        try:
+            make()
+            raise AssertionError("a negative count or position was accepted")
+        except ValueError:
+            pass
+
+    print("All tests passed.")
+
+
+# python -m src.ectools.jax
+if __name__ == "__main__":
+    _test()
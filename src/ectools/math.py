@@ -3,7 +3,6 @@ from typing import TypeAlias
 
 import numpy as np
 from numpy.typing import ArrayLike
-from scipy import special
 
 number_like: TypeAlias = bool | int | float | complex
 
@@ -18,18 +17,164 @@ def logsumexp(
     axis: int | tuple[int] | None = None,
     keepdims: bool = False,
 ) -> np.ndarray:
+    from scipy import special
+
     return special.logsumexp(a, axis=axis, b=b, keepdims=keepdims)
 
 
-def _logsumexp_numpy(
+def _finite_max(
+    a: np.ndarray, axis: int | tuple[int, ...] | None, where: ArrayLike = True
+) -> np.ndarray:
+    """maximum with keepdims, replaced by 0 where it is not finite, to shift exponents safely"""
+    a_max = np.max(a, axis=axis, keepdims=True, where=where, initial=-np.inf)
+    return np.where(np.isfinite(a_max), a_max, 0)
+
+
+def logsumexp_numpy(
     a: ArrayLike,
     b: ArrayLike | None = None,
     axis: int | tuple[int] | None = None,
     keepdims: bool = False,
+    *,
+    out: np.ndarray | None = None,
+    where: ArrayLike = True,
+    scratch: np.ndarray | None = None,
 ) -> np.ndarray:
-    if b is None:
-        b = np.ones_like(a)
-    return np.log(np.sum(b * np.exp(a), axis=axis, keepdims=keepdims))
+    """
+    Stable logsumexp with NumPy alone, so scipy is not imported.
+    `where` masks elements out, `out` receives the result, and `scratch`, shaped like `a`
+    broadcast with `b`, holds the exponentials so that repeated calls reuse it.
+    """
+    a = np.asarray(a)
+    if not np.issubdtype(a.dtype, np.inexact):
+        a = a.astype(np.float64)
+    shift = _finite_max(a, axis, where)
+    # masked elements are skipped by every step, so they cannot overflow or warn; the sum never
+    # reads what they hold
+    tmp = np.subtract(a, shift, out=scratch, where=where)
+    np.exp(tmp, out=tmp, where=where)
+    if b is not None:
+        b = np.asarray(b)
+        tmp = np.multiply(
+            tmp,
+            b,
+            out=tmp if np.broadcast_shapes(tmp.shape, b.shape) == tmp.shape else None,
+            where=where,
+        )
+    total = np.sum(tmp, axis=axis, keepdims=keepdims, out=out, where=where)
+    shift = shift if keepdims else np.squeeze(shift, axis=axis)
+    with np.errstate(divide="ignore"):
+        return np.add(np.log(total, out=out), shift, out=out)
+
+
+def segmented_logsumexp(a: ArrayLike, offsets: ArrayLike, b: ArrayLike | None = None) -> np.ndarray:
+    """
+    One logsumexp per segment along the first axis, segment i spanning a[offsets[i]:offsets[i + 1]]
+    (to the end for the last), with offsets as in np.ufunc.reduceat; empty segments give -inf.
+    """
+    a = np.asarray(a)
+    if not np.issubdtype(a.dtype, np.inexact):
+        a = a.astype(np.float64)
+    offsets = np.asarray(offsets, dtype=np.intp)
+    n = len(a)
+    if np.any(np.diff(offsets) < 0) or np.any(offsets < 0) or np.any(offsets > n):
+        raise ValueError(f"offsets must be nondecreasing and within [0, {n}]")
+    lengths = np.diff(offsets, append=n)
+    nonempty = lengths > 0
+    maxes = np.full((len(offsets), *a.shape[1:]), -np.inf, dtype=a.dtype)
+    sums = np.zeros_like(maxes)
+    if not np.any(nonempty):
+        return maxes
+    a = a[offsets[0] :]
+    b = None if b is None else np.broadcast_to(b, (n, *a.shape[1:]))[offsets[0] :]
+    starts = offsets[nonempty] - offsets[0]
+    maxes[nonempty] = np.maximum.reduceat(a, starts, axis=0)
+    shift = np.where(np.isfinite(maxes), maxes, 0)
+    tmp = a - np.repeat(shift, lengths, axis=0)
+    np.exp(tmp, out=tmp)
+    if b is not None:
+        tmp *= b
+    sums[nonempty] = np.add.reduceat(tmp, starts, axis=0)
+    with np.errstate(divide="ignore"):
+        return np.log(sums) + shift
+
+
+def grouped_logsumexp(
+    a: ArrayLike, group_ids: ArrayLike, num_groups: int | None = None, b: ArrayLike | None = None
+) -> np.ndarray:
+    """
+    One logsumexp per group along the first axis, for unsorted integer `group_ids` in
+    [0, num_groups); groups without elements give -inf.
+    """
+    a = np.asarray(a)
+    if not np.issubdtype(a.dtype, np.inexact):
+        a = a.astype(np.float64)
+    group_ids = np.asarray(group_ids, dtype=np.intp)
+    if num_groups is None:
+        num_groups = int(group_ids.max()) + 1 if len(group_ids) > 0 else 0
+    if np.any(group_ids < 0) or np.any(group_ids >= num_groups):
+        raise ValueError(f"group_ids must be within [0, {num_groups})")
+    maxes = np.full((num_groups, *a.shape[1:]), -np.inf, dtype=a.dtype)
+    np.maximum.at(maxes, group_ids, a)
+    shift = np.where(np.isfinite(maxes), maxes, 0)
+    tmp = a - shift[group_ids]
+    np.exp(tmp, out=tmp)
+    if b is not None:
+        tmp *= b
+    sums = np.zeros_like(maxes)
+    np.add.at(sums, group_ids, tmp)
+    with np.errstate(divide="ignore"):
+        return np.log(sums) + shift
+
+
+class LogSumExpAccumulator:
+    """
+    Online logsumexp over chunks along `axis`, in constant memory.
+    The state is a finite shift (the running maximum) and the sum of exponentials rescaled by it;
+    accumulators fed with other chunks, e.g. by other workers, combine with merge.
+    """
+
+    def __init__(self, axis: int | None = 0):
+        self._axis = axis
+        self._shift: np.ndarray | None = None
+        self._scaled_sum: np.ndarray | None = None
+
+    def __repr__(self) -> str:
+        shape = None if self._shift is None else self._shift.shape
+        return f"LogSumExpAccumulator(axis {self._axis}, result shape {shape})"
+
+    def _combine(self, shift: np.ndarray, scaled_sum: np.ndarray) -> None:
+        if self._shift is None or self._scaled_sum is None:
+            self._shift, self._scaled_sum = shift, scaled_sum
+            return
+        new_shift = np.maximum(self._shift, shift)
+        self._scaled_sum = self._scaled_sum * np.exp(self._shift - new_shift)
+        self._scaled_sum += scaled_sum * np.exp(shift - new_shift)
+        self._shift = new_shift
+
+    def update(self, a: ArrayLike, b: ArrayLike | None = None) -> None:
+        a = np.asarray(a)
+        if self._axis is None:
+            a = a.reshape(-1)
+            b = None if b is None else np.broadcast_to(b, a.shape).reshape(-1)
+        axis = 0 if self._axis is None else self._axis
+        if a.shape[axis] == 0:
+            return
+        shift = _finite_max(a, axis)
+        tmp = np.exp(a - shift)
+        if b is not None:
+            tmp = tmp * b
+        self._combine(np.squeeze(shift, axis=axis), np.sum(tmp, axis=axis))
+
+    def merge(self, other: "LogSumExpAccumulator") -> None:
+        if other._shift is not None and other._scaled_sum is not None:
+            self._combine(other._shift, other._scaled_sum)
+
+    def result(self) -> np.ndarray:
+        if self._shift is None or self._scaled_sum is None:
+            raise ValueError("need at least one non-empty chunk for a result")
+        with np.errstate(divide="ignore"):
+            return np.log(self._scaled_sum) + self._shift
 
 
 def _module_test() -> None:
@@ -41,11 +186,92 @@ def _module_test() -> None:
     # Test logsumexp
     a = np.array([1.0, 2.0, 3.0])
     b = np.array([0.5, 1.5, 2.5])
-    assert np.isclose(logsumexp(a, b=b), _logsumexp_numpy(a, b=b))
+    assert np.isclose(logsumexp(a, b=b), logsumexp_numpy(a, b=b))
 
     a = np.random.rand(12)
     b = np.random.rand(12)
-    assert np.isclose(logsumexp(a, b=b), _logsumexp_numpy(a, b=b))
+    assert np.isclose(logsumexp(a, b=b), logsumexp_numpy(a, b=b))
+
+    # Test logsumexp_numpy stability and edge cases
+    a = np.array([[1000.0, 1000.0], [-np.inf, -np.inf], [np.inf, 0.0]])
+    assert np.allclose(logsumexp_numpy(a[:1], axis=1), 1000 + np.log(2))
+    assert np.array_equal(logsumexp_numpy(a, axis=1), logsumexp(a, axis=1))
+    a = np.random.randn(3, 4, 5)
+    for axis in (None, 0, -1, (0, 2)):
+        for keepdims in (False, True):
+            expected = logsumexp(a, axis=axis, keepdims=keepdims)
+            assert np.allclose(logsumexp_numpy(a, axis=axis, keepdims=keepdims), expected)
+
+    # Test logsumexp_numpy out=, where= and scratch=
+    a = np.random.randn(50, 40)
+    b = np.random.rand(40)
+    where = np.random.rand(50, 40) > 0.3
+    expected = logsumexp(np.where(where, a, -np.inf), b=b, axis=1)
+    scratch = np.empty_like(a)
+    out = np.empty(50)
+    result = logsumexp_numpy(a, b=b, axis=1, out=out, where=where, scratch=scratch)
+    assert result is out and np.allclose(out, expected)
+    assert np.allclose(logsumexp_numpy(a, b=b, axis=1, where=where), expected)
+    assert np.allclose(logsumexp_numpy(np.arange(5)), logsumexp(np.arange(5)))
+    assert logsumexp_numpy(a, where=False) == -np.inf
+    # masked elements, however large, do not overflow
+    a[::2, ::3], b[::3] = 1e308, np.inf
+    where[::2, ::3] = where[:, ::3] = False
+    expected = logsumexp(np.where(where, a, -np.inf), b=np.where(where, b, 0), axis=1)
+    with np.errstate(all="raise"):
+        for scratch in (None, np.full_like(a, np.nan)):
+            result = logsumexp_numpy(a, b=b, axis=1, where=where, scratch=scratch)
+            assert np.allclose(result, expected)
+
+    # Test segmented_logsumexp and grouped_logsumexp
+    a = 50 * np.random.randn(100, 3)
+    b = np.random.rand(100, 3)
+    offsets = np.array([0, 0, 10, 10, 37, 99, 100, 100])
+    bounds = np.append(offsets, 100)
+    expected = np.array(
+        [
+            logsumexp(a[i:j], b=b[i:j], axis=0) if j > i else np.full(3, -np.inf)
+            for i, j in zip(bounds[:-1], bounds[1:])
+        ]
+    )
+    assert np.allclose(segmented_logsumexp(a, offsets, b=b), expected)
+    group_ids = np.random.randint(0, 6, size=100)
+    grouped = grouped_logsumexp(a[:, 0], group_ids, num_groups=7)
+    for g in range(7):
+        members = a[group_ids == g, 0]
+        assert np.isclose(grouped[g], logsumexp(members) if len(members) else -np.inf)
+    order = np.argsort(group_ids, kind="stable")
+    starts = np.searchsorted(group_ids[order], np.arange(7))
+    assert np.allclose(
+        segmented_logsumexp(a[order], starts, b=b[order]), grouped_logsumexp(a, group_ids, 7, b=b)
+    )
+    for ids in ([0, 1, -1], [0, 1, 2]):
+        try:
+            grouped_logsumexp([1.0, 2.0, 3.0], ids, num_groups=2)
+            raise AssertionError(f"group_ids {ids} were accepted for 2 groups")
+        except ValueError:
+            pass
+    assert segmented_logsumexp(np.empty(0), [0, 0]).tolist() == [-np.inf, -np.inf]
+    result = segmented_logsumexp(np.arange(6), [2, 4], b=0.5)
+    assert np.allclose(result, [logsumexp([2, 3], b=0.5), logsumexp([4, 5], b=0.5)])
+
+    # Test LogSumExpAccumulator
+    a = 100 * np.random.randn(1000, 7)
+    b = np.random.rand(1000, 7)
+    accumulator = LogSumExpAccumulator(axis=0)
+    for chunk in np.array_split(np.arange(1000), 13):
+        accumulator.update(a[chunk], b=b[chunk])
+    assert np.allclose(accumulator.result(), logsumexp(a, b=b, axis=0))
+    halves = LogSumExpAccumulator(axis=None), LogSumExpAccumulator(axis=None)
+    halves[0].update(a[:300])
+    halves[1].update(a[300:, :3])
+    halves[1].update(a[300:, 3:])
+    halves[0].merge(halves[1])
+    assert np.allclose(halves[0].result(), logsumexp(a))
+    accumulator = LogSumExpAccumulator(axis=1)
+    accumulator.update(np.full((2, 3), -np.inf))
+    accumulator.update(np.array([[-np.inf], [np.inf]]))
+    assert np.array_equal(accumulator.result(), [-np.inf, np.inf])
 
     print("All tests passed.")
 
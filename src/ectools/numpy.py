@@ -1,20 +1,68 @@
-from collections.abc import Sequence
+import os
+import os.path as osp
+import struct
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import Literal
 
 import numpy as np
+from numpy.typing import ArrayLike, DTypeLike
 
-from .math import number_like
 
-
-def fill_diagonal(
-    x: np.ndarray, value: number_like, *, offset: int = 0, axis1: int = -2, axis2: int = -1
+def fill_diagonal_(
+    x: np.ndarray, value: ArrayLike, *, offset: int = 0, axis1: int = -2, axis2: int = -1
 ) -> np.ndarray:
-    x = x.copy()
+    """
+    value broadcasts against the diagonals, shaped (*batch, length): a (length,) array runs along
+    each diagonal, and one value per matrix is given as values[..., None]
+    """
     diag = np.diagonal(x, offset=offset, axis1=axis1, axis2=axis2)
     diag.setflags(write=True)
     diag[...] = value
     return x
 
 
+def fill_diagonal(
+    x: np.ndarray,
+    value: ArrayLike,
+    *,
+    offset: int = 0,
+    axis1: int = -2,
+    axis2: int = -1,
+    out: np.ndarray | None = None,
+) -> np.ndarray:
+    if out is None:
+        out = x.copy()
+    elif out is not x:
+        np.copyto(out, x)
+    return fill_diagonal_(out, value, offset=offset, axis1=axis1, axis2=axis2)
+
+
+def fill_band_(
+    x: np.ndarray, value: ArrayLike, offsets: Iterable[int], *, axis1: int = -2, axis2: int = -1
+) -> np.ndarray:
+    """write `value` on every diagonal in `offsets` through strided views of `x`, without copies"""
+    for offset in offsets:
+        fill_diagonal_(x, value, offset=offset, axis1=axis1, axis2=axis2)
+    return x
+
+
+def fill_band(
+    x: np.ndarray,
+    value: ArrayLike,
+    offsets: Iterable[int],
+    *,
+    axis1: int = -2,
+    axis2: int = -1,
+    out: np.ndarray | None = None,
+) -> np.ndarray:
+    if out is None:
+        out = x.copy()
+    elif out is not x:
+        np.copyto(out, x)
+    return fill_band_(out, value, offsets, axis1=axis1, axis2=axis2)
+
+
 def np_prng_key(random_seed: int | np.random.SeedSequence | None) -> np.random.SeedSequence:
     if isinstance(random_seed, np.random.SeedSequence):
         return random_seed
@@ -25,11 +73,262 @@ def np_prng(random_seed: int | np.random.SeedSequence | None) -> np.random.Gener
     return np.random.default_rng(np_prng_key(random_seed))
 
 
+def np_prng_keys(
+    random_seed: int | np.random.SeedSequence | None, n: int
+) -> Sequence[np.random.SeedSequence]:
+    """independent child keys; spawning again from the same SeedSequence gives new children"""
+    return tuple(np_prng_key(random_seed).spawn(n))
+
+
+def np_prngs(
+    random_seed: int | np.random.SeedSequence | None, n: int
+) -> Sequence[np.random.Generator]:
+    return tuple(map(np.random.default_rng, np_prng_keys(random_seed, n)))
+
+
+def np_prng_fill_(
+    out: np.ndarray,
+    random_seed: int | np.random.SeedSequence | None,
+    method: Literal[
+        "random", "standard_normal", "standard_exponential", "standard_gamma"
+    ] = "standard_normal",
+    *,
+    chunk_size: int = 2**20,
+    max_workers: int | None = None,
+    **kwargs,
+) -> np.ndarray:
+    """
+    Fill `out` in chunks of `chunk_size` elements on a thread pool, each chunk drawn from its own
+    child stream of `random_seed`. The result depends on `chunk_size` but not on `max_workers`.
+    """
+    if not (out.flags.c_contiguous or out.flags.f_contiguous):
+        raise ValueError("out must be C- or F-contiguous to be filled in place")
+    flat = out.reshape(-1, order="A")
+    starts = range(0, flat.size, chunk_size)
+    prngs = np_prngs(random_seed, len(starts))
+
+    def fill_(prng: np.random.Generator, start: int) -> None:
+        getattr(prng, method)(out=flat[start : start + chunk_size], dtype=out.dtype, **kwargs)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        tuple(executor.map(fill_, prngs, starts))
+    return out
+
+
+def concatenable(ndim: int, axis: int) -> bool:
+    """whether arrays with `ndim` dimensions are concatenated along `axis` rather than stacked"""
+    return -ndim <= axis < ndim
+
+
 def np_generalized_concat(arrays: Sequence[np.ndarray], axis: int = 0, **kwargs) -> np.ndarray:
-    try:
-        return np.concatenate(arrays, axis=axis, **kwargs)
-    except ValueError:
+    if len(arrays) > 0 and not concatenable(np.ndim(arrays[0]), axis):
         return np.stack(arrays, axis=axis, **kwargs)
+    return np.concatenate(arrays, axis=axis, **kwargs)
+
+
+class NpAccumulator:
+    """
+    Growable buffer standing in for repeated np_generalized_concat calls.
+    - concatenate vs stack is decided once from the first chunk, as np_generalized_concat does
+    - capacity grows geometrically, so append is amortised O(1)
+    - finalize returns a view of the buffer without copying
+    """
+
+    def __init__(
+        self,
+        axis: int = 0,
+        *,
+        dtype: DTypeLike = None,
+        initial_capacity: int = 16,
+        growth_factor: float = 2.0,
+    ):
+        assert growth_factor > 1, "growth_factor must be greater than 1"
+        self._axis = axis
+        self._dtype = dtype
+        self._initial_capacity = max(1, initial_capacity)
+        self._growth_factor = growth_factor
+        self._stack: bool | None = None
+        self._buffer: np.ndarray | None = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __repr__(self) -> str:
+        return f"NpAccumulator({self._size} of {self.capacity} along axis {self._axis})"
+
+    @property
+    def capacity(self) -> int:
+        return 0 if self._buffer is None else len(self._buffer)
+
+    def _rows(self, chunk: np.ndarray) -> np.ndarray:
+        """the chunk with the accumulation axis leading"""
+        if self._stack:
+            return chunk[np.newaxis]
+        return np.moveaxis(chunk, self._axis, 0)
+
+    def _reserve(self, size: int, rows: np.ndarray) -> None:
+        if self._buffer is None:
+            capacity = max(self._initial_capacity, size)
+            dtype = rows.dtype if self._dtype is None else self._dtype
+            self._buffer = np.empty((capacity, *rows.shape[1:]), dtype=dtype)
+            return
+        if rows.shape[1:] != self._buffer.shape[1:]:
+            raise ValueError(f"chunk shape {rows.shape[1:]} != {self._buffer.shape[1:]}")
+        # promote like np_generalized_concat, or cast like np.concatenate(dtype=...) does
+        dtype = self._buffer.dtype
+        if self._dtype is None:
+            dtype = np.result_type(dtype, rows.dtype)
+        elif not np.can_cast(rows.dtype, dtype, "same_kind"):
+            raise TypeError(f"cannot cast chunk of dtype {rows.dtype} to {dtype} (same_kind)")
+        if size <= len(self._buffer) and dtype == self._buffer.dtype:
+            return
+        capacity = len(self._buffer)
+        if size > capacity:
+            capacity = max(size, int(capacity * self._growth_factor) + 1)
+        buffer = np.empty((capacity, *self._buffer.shape[1:]), dtype=dtype)
+        buffer[: self._size] = self._buffer[: self._size]
+        self._buffer = buffer
+
+    def append(self, chunk: ArrayLike) -> None:
+        chunk = np.asanyarray(chunk)
+        if self._stack is None:
+            self._stack = not concatenable(chunk.ndim, self._axis)
+        rows = self._rows(chunk)
+        size = self._size + len(rows)
+        self._reserve(size, rows)
+        self._buffer[self._size : size] = rows  # type: ignore
+        self._size = size
+
+    def extend(self, chunks: Iterable[ArrayLike]) -> None:
+        for chunk in chunks:
+            self.append(chunk)
+
+    def finalize(self) -> np.ndarray:
+        if self._buffer is None:
+            raise ValueError("need at least one array to finalize")
+        return np.moveaxis(self._buffer[: self._size], 0, self._axis)
+
+
+def _npy_header_dict(dtype: np.dtype, shape: tuple[int, ...], fortran_order: bool) -> str:
+    descr = np.lib.format.dtype_to_descr(dtype)
+    return repr({"descr": descr, "fortran_order": fortran_order, "shape": shape})
+
+
+def _npy_header_length(dtype: np.dtype, ndim: int, fortran_order: bool) -> int:
+    """bytes of a version 1.0 .npy header that fits any shape with `ndim` dimensions"""
+    widest = _npy_header_dict(dtype, (np.iinfo(np.int64).max,) * ndim, fortran_order)
+    return -(-(len(np.lib.format.MAGIC_PREFIX) + 4 + len(widest) + 1) // 64) * 64
+
+
+def _npy_header(dtype: np.dtype, shape: tuple[int, ...], fortran_order: bool, length: int) -> bytes:
+    """a version 1.0 .npy header padded to exactly `length` bytes, to be rewritten in place"""
+    magic = np.lib.format.magic(1, 0)
+    header_length = length - len(magic) - 2
+    header = _npy_header_dict(dtype, shape, fortran_order).ljust(header_length - 1) + "\n"
+    return magic + struct.pack("<H", header_length) + header.encode("latin1")
+
+
+def _same_but_axis(shape: tuple[int, ...], other: tuple[int, ...], axis: int) -> bool:
+    return len(shape) == len(other) and all(
+        a == b for i, (a, b) in enumerate(zip(shape, other)) if i != axis % len(shape)
+    )
+
+
+class NpyAccumulator:
+    """
+    Out-of-core counterpart of NpAccumulator, for results larger than memory.
+    Chunks are written straight to a .npy file as they arrive and finalize returns an np.memmap.
+    Only the first or the last axis can grow: the file is stored in C order for axis 0 and in
+    Fortran order for the last axis, so each chunk is a contiguous run of bytes at the end.
+    """
+
+    def __init__(self, filepath: str, axis: int = 0, *, dtype: DTypeLike = None):
+        os.makedirs(osp.dirname(filepath) or ".", exist_ok=True)
+        self._filepath = filepath
+        self._file = open(filepath, "wb")
+        self._axis = axis
+        self._dtype = None if dtype is None else np.dtype(dtype)
+        self._stack: bool | None = None
+        self._fortran_order = False
+        self._shape: tuple[int, ...] | None = None
+        self._header_length = 0
+
+    def __enter__(self) -> "NpyAccumulator":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return 0 if self._shape is None else self._shape[self._grown_axis]
+
+    @property
+    def _grown_axis(self) -> int:
+        return -1 if self._fortran_order else 0
+
+    def _start(self, chunk: np.ndarray) -> None:
+        self._stack = not concatenable(chunk.ndim, self._axis)
+        ndim = chunk.ndim + 1 if self._stack else chunk.ndim
+        axis = np.lib.array_utils.normalize_axis_index(self._axis, ndim)
+        if axis not in (0, ndim - 1):
+            raise ValueError(f"only the first or the last of {ndim} axes can grow, not {axis}")
+        self._fortran_order = axis == ndim - 1 and ndim > 1
+        self._dtype = chunk.dtype if self._dtype is None else self._dtype
+        shape = list(np.expand_dims(chunk, self._axis).shape if self._stack else chunk.shape)
+        shape[self._grown_axis] = 0
+        self._shape = tuple(shape)
+        self._header_length = _npy_header_length(self._dtype, ndim, self._fortran_order)
+        self._file.write(
+            _npy_header(self._dtype, self._shape, self._fortran_order, self._header_length)
+        )
+
+    def append(self, chunk: ArrayLike) -> None:
+        chunk = np.asanyarray(chunk)
+        if self._shape is None:
+            self._start(chunk)
+        if self._stack:
+            chunk = np.expand_dims(chunk, self._axis)
+        if not np.can_cast(chunk.dtype, self._dtype, "same_kind"):
+            raise TypeError(
+                f"cannot cast chunk of dtype {chunk.dtype} to {self._dtype} (same_kind)"
+            )
+        chunk = chunk.astype(self._dtype, copy=False)
+        grown = self._grown_axis
+        if not _same_but_axis(chunk.shape, self._shape, grown):
+            raise ValueError(f"chunk shape {chunk.shape} does not extend {self._shape}")
+        self._file.write(np.ascontiguousarray(chunk.T if self._fortran_order else chunk))
+        shape = list(self._shape)
+        shape[grown] += chunk.shape[grown]
+        self._shape = tuple(shape)
+
+    def extend(self, chunks: Iterable[ArrayLike]) -> None:
+        for chunk in chunks:
+            self.append(chunk)
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        if self._shape is not None:
+            self._file.seek(0)
+            self._file.write(
+                _npy_header(self._dtype, self._shape, self._fortran_order, self._header_length)
+            )
+        self._file.close()
+
+    def finalize(self, mmap_mode: Literal["r", "r+", "c"] = "r") -> np.memmap:
+        if self._shape is None:
+            raise ValueError("need at least one array to finalize")
+        self.close()
+        return np.load(self._filepath, mmap_mode=mmap_mode)
+
+
+def np_generalized_concat_to_npy(
+    arrays: Iterable[ArrayLike], filepath: str, axis: int = 0, *, dtype: DTypeLike = None
+) -> np.memmap:
+    with NpyAccumulator(filepath, axis, dtype=dtype) as accumulator:
+        accumulator.extend(arrays)
+        return accumulator.finalize()
 
 
 # np_prng: Callable[[int | np.random.SeedSequence | None], np.random.Generator] = cmp(
@@ -655,5 +954,162 @@ def test_fill_diagonal_all_dimensions():
     return tests_passed, tests_failed
 
 
+def test_fill_diagonal_in_place_out_and_band():
+    x = np.ones((3, 4, 4))
+    result = fill_diagonal_(x, 0)
+    assert result is x and np.all(np.diagonal(x, axis1=-2, axis2=-1) == 0)
+
+    x = np.ones((3, 4, 4))
+    out = np.empty_like(x, order="F")
+    result = fill_diagonal(x, 0, out=out)
+    assert result is out and np.all(x == 1)
+    assert np.array_equal(out, fill_diagonal(x, 0))
+
+    x = np.zeros((3, 4, 4))
+    fill_diagonal_(x, np.array([1.0, 2.0, 3.0])[:, None])
+    for i in range(3):
+        assert np.all(np.diagonal(x[i]) == i + 1), f"per-batch value {i} not written"
+    x = fill_diagonal(np.zeros((3, 3, 3)), np.array([1.0, 2.0, 3.0]))
+    assert all(np.array_equal(np.diagonal(x[i]), [1, 2, 3]) for i in range(3)), "B == N broadcast"
+
+    x = np.zeros((2, 5, 5))
+    fill_diagonal_(x[:, ::-1, :], 7)
+    assert np.all(np.diagonal(x[:, ::-1, :], axis1=-2, axis2=-1) == 7), "non-contiguous view"
+
+    x = np.zeros((2, 6, 6), dtype=bool)
+    result = fill_band(x, True, range(-1, 2))
+    expected = np.abs(np.subtract.outer(np.arange(6), np.arange(6))) <= 1
+    assert np.array_equal(result, np.broadcast_to(expected, x.shape)) and not x.any()
+    assert fill_band_(x, True, (-1, 0, 1)) is x and np.array_equal(x, result)
+
+    x = np.ones((2, 2))
+    x.setflags(write=False)
+    try:
+        fill_diagonal_(x, 0)
+        raise AssertionError("read-only array was written")
+    except ValueError:
+        pass
+    assert np.array_equal(fill_diagonal(x, 0), [[0, 1], [1, 0]])
+
+    print("All in-place, out= and band fill tests passed.")
+
+
+def test_np_prng_streams():
+    streams = tuple(prng.random(4) for prng in np_prngs(0, 3))
+    again = tuple(prng.random(4) for prng in np_prngs(0, 3))
+    assert all(map(np.array_equal, streams, again)), "child streams not reproducible"
+    assert not np.array_equal(streams[0], streams[1]), "child streams overlap"
+
+    root = np_prng_key(0)
+    grandchildren = np_prng_keys(np_prng_keys(root, 2)[1], 2)
+    assert grandchildren[0].spawn_key == (1, 0)
+
+    a = np_prng_fill_(np.empty((1000, 37)), 0, chunk_size=4096, max_workers=1)
+    b = np_prng_fill_(np.empty((1000, 37)), 0, chunk_size=4096, max_workers=4)
+    assert np.array_equal(a, b), "result depends on the number of workers"
+    c = np_prng_fill_(np.empty((37, 1000), dtype=np.float32, order="F"), 0, "random")
+    assert c.dtype == np.float32 and 0 <= c.min() and c.max() < 1
+    try:
+        np_prng_fill_(np.empty((10, 10))[:, ::2], 0)
+        raise AssertionError("non-contiguous out was accepted")
+    except ValueError:
+        pass
+
+    print("All parallel PRNG stream tests passed.")
+
+
+def test_np_accumulator():
+    rng = np_prng(0)
+    for axis, shapes in ((0, ((2, 3), (5, 3), (1, 3))), (1, ((4, 2), (4, 7))), (-1, ((3,), (3,)))):
+        chunks = tuple(rng.random(shape) for shape in shapes)
+        accumulator = NpAccumulator(axis, initial_capacity=1)
+        accumulator.extend(chunks)
+        expected = np_generalized_concat(chunks, axis=axis)
+        assert np.array_equal(accumulator.finalize(), expected), f"axis {axis} {shapes}"
+        assert len(accumulator) == expected.shape[axis]
+
+    accumulator = NpAccumulator(1)
+    for i in range(100):
+        accumulator.append(np.full(3, i))
+    result = accumulator.finalize()
+    assert result.shape == (3, 100) and np.array_equal(result[1], np.arange(100))
+    assert np.shares_memory(result, accumulator._buffer), "finalize copied the buffer"
+    assert accumulator.capacity < 2 * 100 + 2
+
+    accumulator = NpAccumulator()
+    accumulator.extend(map(np.float32, range(5)))
+    assert np.array_equal(accumulator.finalize(), np.arange(5)) and len(accumulator) == 5
+
+    accumulator = NpAccumulator()
+    accumulator.extend(([1, 2], [0.5]))
+    assert np.array_equal(accumulator.finalize(), np_generalized_concat(([1, 2], [0.5])))
+    accumulator = NpAccumulator(dtype=np.int64)
+    accumulator.append([1, 2])
+    try:
+        accumulator.append([0.5])
+        raise AssertionError("float chunk was truncated into an int buffer")
+    except TypeError:
+        pass
+
+    accumulator = NpAccumulator()
+    accumulator.append(np.zeros((2, 3)))
+    try:
+        accumulator.append(np.zeros((1, 1)))
+        raise AssertionError("mismatched chunk was accepted")
+    except ValueError:
+        pass
+
+    print("All accumulator tests passed.")
+
+
+def test_npy_accumulator():
+    import tempfile
+
+    rng = np_prng(0)
+    with tempfile.TemporaryDirectory() as dirname:
+        cases = (
+            (0, ((2, 3), (5, 3), (1, 3))),
+            (-1, ((4, 2), (4, 7))),
+            (1, ((3,), (3,))),
+            (0, ((2, 3, 4), (2, 3, 4))),
+            (0, ((), (), ())),
+        )
+        for i, (axis, shapes) in enumerate(cases):
+            chunks = tuple(rng.random(shape) for shape in shapes)
+            filepath = osp.join(dirname, "sub", f"{i}.npy")
+            result = np_generalized_concat_to_npy(iter(chunks), filepath, axis)
+            expected = np_generalized_concat(chunks, axis=axis)
+            assert isinstance(result, np.memmap), f"case {i} not memory-mapped"
+            assert np.array_equal(result, expected), f"case {i}: axis {axis} {shapes}"
+            assert np.array_equal(np.load(filepath), expected), f"case {i} header"
+
+        filepath = osp.join(dirname, "rows.npy")
+        with NpyAccumulator(filepath, dtype=np.float32) as accumulator:
+            for i in range(1000):
+                accumulator.append(np.full((1, 8), i))
+            assert len(accumulator) == 1000
+        assert np.load(filepath, mmap_mode="r")[999, 0] == 999
+
+        with NpyAccumulator(osp.join(dirname, "ints.npy")) as accumulator:
+            accumulator.append(np.arange(3))
+            try:
+                accumulator.append(np.full(2, 0.5))
+                raise AssertionError("float chunk was truncated into an int file")
+            except TypeError:
+                pass
+
+        try:
+            np_generalized_concat_to_npy((np.zeros((2, 3, 4)),), osp.join(dirname, "x.npy"), 1)
+            raise AssertionError("middle axis was accepted")
+        except ValueError:
+            pass
+
+    print("All out-of-core accumulator tests passed.")
+
+
 if __name__ == "__main__":
     test_fill_diagonal_all_dimensions()
+    test_fill_diagonal_in_place_out_and_band()
+    test_np_prng_streams()
+    test_np_accumulator()
+    test_npy_accumulator()
@@ -1,7 +1,16 @@
+import bisect
 import difflib
+import hashlib
 import re
-from collections.abc import Sequence
+import sys
+from collections.abc import Callable, Hashable, Iterable, Iterator, Sequence
+from functools import lru_cache
 from functools import partial as prt
+from itertools import islice, zip_longest
+from typing import TYPE_CHECKING, TypeAlias
+
+if TYPE_CHECKING:
+    import polars as pl
 
 
 def format_with_spec(format_spec: str, value: object) -> str:
@@ -20,25 +29,92 @@ def bool_ex_str(x: str, /) -> bool:
             raise ValueError(f"Unknown boolean string: {x}")
 
 
+non_word_run_pattern = re.compile(r"[_\W]+")
+non_alphanumeric_run_pattern = re.compile(r"[^a-zA-Z0-9]+")
+non_alphanumeric_pattern = re.compile(r"[^a-zA-Z0-9]")
+underscore_or_dot_run_pattern = re.compile(r"[_\.]+")
+left_bracket_without_blank_line_pattern = re.compile(r"(?<!\n\n)(\n)(?=\[)")
+
+
 def upper_camel_case(x: str, /) -> str:
-    return "".join(w.capitalize() for w in re.split(r"[_\W]+", x))
+    return "".join(w.capitalize() for w in non_word_run_pattern.split(x))
 
 
 def snake_case(x: str, /) -> str:
-    return re.sub(r"[^a-zA-Z0-9]+", "_", x).strip("_").lower()
+    return non_alphanumeric_run_pattern.sub("_", x).strip("_").lower()
 
 
 def to_underscore(x: str, /) -> str:
-    return re.sub(r"[^a-zA-Z0-9]", "_", x)
+    return non_alphanumeric_pattern.sub("_", x)
 
 
 def space_case(x: str, /) -> str:
-    return re.sub(r"[_\.]+", " ", x).strip()
+    return underscore_or_dot_run_pattern.sub(" ", x).strip()
+
+
+# ================================================================
+# batch case conversion over iterables of strings or polars Series
+
+_case_cache_size = 2**16
+
+
+def _upper_camel_case_polars(s: "pl.Series") -> "pl.Series":
+    import polars as pl
+
+    words = s.str.replace_all(non_word_run_pattern.pattern, " ").str.split(" ")
+    first, rest = pl.element().str.slice(0, 1), pl.element().str.slice(1)
+    capitalized = first.str.to_titlecase() + rest.str.to_lowercase()
+    return words.list.eval(capitalized).list.join("")
+
+
+def _snake_case_polars(s: "pl.Series") -> "pl.Series":
+    snake = s.str.replace_all(non_alphanumeric_run_pattern.pattern, "_")
+    return snake.str.strip_chars("_").str.to_lowercase()
+
+
+def _to_underscore_polars(s: "pl.Series") -> "pl.Series":
+    return s.str.replace_all(non_alphanumeric_pattern.pattern, "_")
+
+
+def _space_case_polars(s: "pl.Series") -> "pl.Series":
+    return s.str.replace_all(underscore_or_dot_run_pattern.pattern, " ").str.strip_chars()
+
+
+_upper_camel_case_cached = lru_cache(maxsize=_case_cache_size)(upper_camel_case)
+_snake_case_cached = lru_cache(maxsize=_case_cache_size)(snake_case)
+_to_underscore_cached = lru_cache(maxsize=_case_cache_size)(to_underscore)
+_space_case_cached = lru_cache(maxsize=_case_cache_size)(space_case)
+
+
+def _batch[S](
+    f: Callable[[str], str], f_polars: Callable[[S], S], xs: Iterable[str] | S
+) -> Sequence[str] | S:
+    """polars kernels for a Series, otherwise `f` mapped over the strings"""
+    if "polars" in sys.modules and isinstance(xs, sys.modules["polars"].Series):
+        return f_polars(xs).alias(xs.name)
+    return tuple(map(f, xs))  # type: ignore
+
+
+def upper_camel_case_batch[S](xs: Iterable[str] | S, /, cache: bool = False) -> Sequence[str] | S:
+    f = _upper_camel_case_cached if cache else upper_camel_case
+    return _batch(f, _upper_camel_case_polars, xs)
+
+
+def snake_case_batch[S](xs: Iterable[str] | S, /, cache: bool = False) -> Sequence[str] | S:
+    return _batch(_snake_case_cached if cache else snake_case, _snake_case_polars, xs)
+
+
+def to_underscore_batch[S](xs: Iterable[str] | S, /, cache: bool = False) -> Sequence[str] | S:
+    return _batch(_to_underscore_cached if cache else to_underscore, _to_underscore_polars, xs)
+
+
+def space_case_batch[S](xs: Iterable[str] | S, /, cache: bool = False) -> Sequence[str] | S:
+    return _batch(_space_case_cached if cache else space_case, _space_case_polars, xs)
 
 
 def ensure_blank_line_before_left_bracket(x: str, /) -> str:
     # the pattern matches a line starting with '[' that does not have a blank line before it; useful for toml file creation
-    return re.sub(r"(?<!\n\n)(\n)(?=\[)", "\n\n", x)
+    return left_bracket_without_blank_line_pattern.sub("\n\n", x)
 
 
 def have_newlines_at_the_end(s: str, /, n: int) -> str:
@@ -64,11 +140,415 @@ def nl(n: int, /) -> str:
 have_1_newline_at_the_end = prt(have_newlines_at_the_end, n=1)
 
 
-def string_diff(text1: str, text2: str, fromfile: str = "", tofile: str = ""):
+def _spaces_substitution(
+    spaces: int | None, double_spaces: int | None
+) -> tuple[re.Pattern[str], str] | None:
+    # normalized_spaces followed by normalized_double_spaces is a single substitution of " +"
+    if spaces is not None:
+        if double_spaces is not None and spaces >= 2:
+            spaces = double_spaces
+        return re.compile(r" +"), " " * spaces
+    if double_spaces is not None:
+        return re.compile(r" {2,}"), " " * double_spaces
+    return None
+
+
+def normalized_text_chunks(
+    chunks: Iterable[str],
+    /,
+    *,
+    spaces: int | None = None,
+    double_spaces: int | None = None,
+    blank_line_before_left_bracket: bool = False,
+    newlines_at_the_end: int | None = None,
+) -> Iterator[str]:
+    """
+    Fuse normalized_spaces, normalized_double_spaces, ensure_blank_line_before_left_bracket and
+    have_newlines_at_the_end, in this order, into one traversal of a stream of text chunks, e.g. an
+    open file or a generator of TOML/YAML pieces. A transform is skipped when its argument is None
+    or False. Yields pieces whose concatenation is the normalized text, not one per input chunk:
+    text after the last newline seen so far is held back until a later newline or the end, so
+    chunks without a newline yield nothing, and a last piece, possibly empty, is always yielded.
+    """
+    substitution = _spaces_substitution(spaces, double_spaces)
+    # blocks are cut just before a newline, so no run of spaces and no "\n[" straddles two blocks;
+    # the bracket lookbehind sees the previous block through two placeholder characters that only
+    # keep whether each of the last two characters was a newline
+    carry, context, held = "", "xx", ""
+
+    def normalized(block: str) -> str:
+        nonlocal context, held
+        if substitution is not None:
+            block = substitution[0].sub(substitution[1], block)
+        if blank_line_before_left_bracket:
+            lookbehind = "".join("\n" if c == "\n" else "x" for c in (context + block)[-2:])
+            block = left_bracket_without_blank_line_pattern.sub("\n\n", context + block)[2:]
+            context = lookbehind
+        if newlines_at_the_end is None:
+            return block
+        block = held + block
+        stripped = block.rstrip("\n")
+        held = block[len(stripped) :]
+        return stripped
+
+    for chunk in chunks:
+        buffer = carry + chunk
+        cut = buffer.rfind("\n")
+        if cut <= 0:
+            carry = buffer
+            continue
+        carry = buffer[cut:]
+        yield normalized(buffer[:cut])
+    tail = normalized(carry)
+    yield tail + ("\n" * newlines_at_the_end if newlines_at_the_end is not None else "")
+
+
+def normalized_text(
+    s: str,
+    /,
+    *,
+    spaces: int | None = None,
+    double_spaces: int | None = None,
+    blank_line_before_left_bracket: bool = False,
+    newlines_at_the_end: int | None = None,
+) -> str:
+    """normalized_text_chunks on a single string"""
+    return "".join(
+        normalized_text_chunks(
+            (s,),
+            spaces=spaces,
+            double_spaces=double_spaces,
+            blank_line_before_left_bracket=blank_line_before_left_bracket,
+            newlines_at_the_end=newlines_at_the_end,
+        )
+    )
+
+
+# ================================================================
+# unified diffs of large, mostly identical texts
+
+Block: TypeAlias = tuple[int, int, int]
+Opcode: TypeAlias = tuple[str, int, int, int, int]
+max_myers_work: int = 2**16
+
+
+def _common_prefix_length(a: Sequence, b: Sequence, alo: int, ahi: int, blo: int, bhi: int) -> int:
+    n = 0
+    while alo + n < ahi and blo + n < bhi and a[alo + n] == b[blo + n]:
+        n += 1
+    return n
+
+
+def _common_suffix_length(a: Sequence, b: Sequence, alo: int, ahi: int, blo: int, bhi: int) -> int:
+    n = 0
+    while alo < ahi - n and blo < bhi - n and a[ahi - n - 1] == b[bhi - n - 1]:
+        n += 1
+    return n
+
+
+def _unique_common_anchors(
+    a: Sequence[int], b: Sequence[int], alo: int, ahi: int, blo: int, bhi: int
+) -> Sequence[tuple[int, int]]:
+    """the longest increasing sequence of (i, j) with a[i] == b[j] unique in both ranges"""
+    a_counts: dict[int, int] = {}
+    a_positions: dict[int, int] = {}
+    for i in range(alo, ahi):
+        a_counts[a[i]] = a_counts.get(a[i], 0) + 1
+        a_positions[a[i]] = i
+    b_counts: dict[int, int] = {}
+    b_positions: dict[int, int] = {}
+    for j in range(blo, bhi):
+        b_counts[b[j]] = b_counts.get(b[j], 0) + 1
+        b_positions[b[j]] = j
+    pairs = sorted(
+        (a_positions[x], b_positions[x])
+        for x, count in a_counts.items()
+        if count == 1 and b_counts.get(x) == 1
+    )
+    # patience sorting on j, keeping back pointers to recover the sequence
+    tails: list[int] = []
+    tail_indices: list[int] = []
+    previous = [-1] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        pile = bisect.bisect_left(tails, j)
+        if pile == len(tails):
+            tails.append(j)
+            tail_indices.append(k)
+        else:
+            tails[pile] = j
+            tail_indices[pile] = k
+        previous[k] = tail_indices[pile - 1] if pile > 0 else -1
+    anchors = []
+    k = tail_indices[-1] if tail_indices else -1
+    while k >= 0:
+        anchors.append(pairs[k])
+        k = previous[k]
+    return anchors[::-1]
+
+
+def _myers_blocks(
+    a: Sequence[int],
+    b: Sequence[int],
+    alo: int,
+    ahi: int,
+    blo: int,
+    bhi: int,
+    max_work: int,
+) -> Sequence[Block] | None:
+    """
+    Myers' O((N + M) D) greedy diff, or None once it has visited more than `max_work` diagonals
+    and matching lines, which bounds both its time and its O(D^2) trace
+    """
+    n, m = ahi - alo, bhi - blo
+    previous: dict[int, int] = {1: 0}
+    trace: list[dict[int, int]] = []
+    work = 0
+    for d in range(n + m + 1):
+        work += d + 1
+        if work > max_work:
+            return None
+        current: dict[int, int] = {}
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and previous[k - 1] < previous[k + 1]):
+                x = previous[k + 1]
+            else:
+                x = previous[k - 1] + 1
+            y = x - k
+            start = x
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x, y = x + 1, y + 1
+            work += x - start
+            current[k] = x
+            if x >= n and y >= m:
+                trace.append(current)
+                return _myers_backtracked(trace, alo, blo, n, m)
+        trace.append(current)
+        previous = current
+    return None
+
+
+def _myers_backtracked(
+    trace: Sequence[dict[int, int]], alo: int, blo: int, x: int, y: int
+) -> Sequence[Block]:
+    blocks = []
+    for d in range(len(trace) - 1, 0, -1):
+        k, previous = x - y, trace[d - 1]
+        down = k == -d or (k != d and previous[k - 1] < previous[k + 1])
+        previous_k = k + 1 if down else k - 1
+        previous_x = previous[previous_k]
+        previous_y = previous_x - previous_k
+        start_x = previous_x if down else previous_x + 1
+        if x > start_x:
+            blocks.append((alo + start_x, blo + start_x - k, x - start_x))
+        x, y = previous_x, previous_y
+    if x > 0:
+        blocks.append((alo, blo, x))
+    return blocks[::-1]
+
+
+def _patience_blocks_(
+    a: Sequence[int], b: Sequence[int], alo: int, ahi: int, blo: int, bhi: int, blocks: list[Block]
+) -> None:
+    prefix = _common_prefix_length(a, b, alo, ahi, blo, bhi)
+    if prefix:
+        blocks.append((alo, blo, prefix))
+    alo, blo = alo + prefix, blo + prefix
+    suffix = _common_suffix_length(a, b, alo, ahi, blo, bhi)
+    ahi, bhi = ahi - suffix, bhi - suffix
+    if alo < ahi and blo < bhi:
+        anchors = _unique_common_anchors(a, b, alo, ahi, blo, bhi)
+        if anchors:
+            for i, j in anchors:
+                _patience_blocks_(a, b, alo, i, blo, j, blocks)
+                blocks.append((i, j, 1))
+                alo, blo = i + 1, j + 1
+            _patience_blocks_(a, b, alo, ahi, blo, bhi, blocks)
+        elif (myers := _myers_blocks(a, b, alo, ahi, blo, bhi, max_myers_work)) is not None:
+            blocks.extend(myers)
+        else:
+            # with autojunk, lines frequent enough to make difflib quadratic are never matched
+            matcher = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi])
+            blocks.extend((alo + i, blo + j, n) for i, j, n in matcher.get_matching_blocks() if n)
+    if suffix:
+        blocks.append((ahi, bhi, suffix))
+
+
+def patience_matching_blocks(a: Sequence[Hashable], b: Sequence[Hashable]) -> Sequence[Block]:
+    """
+    Matching blocks as in difflib.SequenceMatcher, by patience diff: common prefix and suffix are
+    stripped, lines unique to both sides anchor the alignment, and the regions between anchors are
+    aligned by Myers' algorithm, or by difflib when that takes more than max_myers_work steps.
+    """
+    ids: dict[Hashable, int] = {}
+    a_ids = [ids.setdefault(x, len(ids)) for x in a]
+    b_ids = [ids.setdefault(x, len(ids)) for x in b]
+    blocks: list[Block] = []
+    _patience_blocks_(a_ids, b_ids, 0, len(a), 0, len(b), blocks)
+    merged: list[Block] = []
+    for i, j, n in blocks:
+        if merged and merged[-1][0] + merged[-1][2] == i and merged[-1][1] + merged[-1][2] == j:
+            merged[-1] = (merged[-1][0], merged[-1][1], merged[-1][2] + n)
+        else:
+            merged.append((i, j, n))
+    merged.append((len(a), len(b), 0))
+    return tuple(merged)
+
+
+def _opcodes(blocks: Iterable[Block]) -> Sequence[Opcode]:
+    """difflib.SequenceMatcher.get_opcodes from matching blocks"""
+    i = j = 0
+    opcodes = []
+    for ai, bj, size in blocks:
+        if i < ai and j < bj:
+            opcodes.append(("replace", i, ai, j, bj))
+        elif i < ai:
+            opcodes.append(("delete", i, ai, j, bj))
+        elif j < bj:
+            opcodes.append(("insert", i, ai, j, bj))
+        i, j = ai + size, bj + size
+        if size:
+            opcodes.append(("equal", ai, i, bj, j))
+    return tuple(opcodes)
+
+
+def _grouped_opcodes(opcodes: Sequence[Opcode], n: int) -> Iterator[Sequence[Opcode]]:
+    """difflib.SequenceMatcher.get_grouped_opcodes from opcodes"""
+    codes = list(opcodes) or [("equal", 0, 1, 0, 1)]
+    if codes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if codes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+    group: list[Opcode] = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal" and i2 - i1 > 2 * n:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+
+def _format_range_unified(start: int, stop: int) -> str:
+    length = stop - start
+    if length == 1:
+        return f"{start + 1}"
+    return f"{start + 1 if length else start},{length}"
+
+
+def _unified_diff(
+    a_line: Callable[[int], str],
+    b_line: Callable[[int], str],
+    groups: Iterable[Sequence[Opcode]],
+    fromfile: str,
+    tofile: str,
+) -> Iterator[str]:
+    """difflib.unified_diff from grouped opcodes, with lines looked up by index"""
+    for k, group in enumerate(groups):
+        if k == 0:
+            yield f"--- {fromfile}\n"
+            yield f"+++ {tofile}\n"
+        first, last = group[0], group[-1]
+        a_range = _format_range_unified(first[1], last[2])
+        b_range = _format_range_unified(first[3], last[4])
+        yield f"@@ -{a_range} +{b_range} @@\n"
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                yield from (" " + a_line(i) for i in range(i1, i2))
+                continue
+            if tag in ("replace", "delete"):
+                yield from ("-" + a_line(i) for i in range(i1, i2))
+            if tag in ("replace", "insert"):
+                yield from ("+" + b_line(j) for j in range(j1, j2))
+
+
+def string_diff(
+    text1: str,
+    text2: str,
+    fromfile: str = "",
+    tofile: str = "",
+    patience: bool = False,
+    n: int = 3,
+) -> str:
+    """unified diff; `patience` scales to large, mostly identical texts"""
     text1_lines = text1.splitlines(keepends=True)
     text2_lines = text2.splitlines(keepends=True)
-    diff = difflib.unified_diff(text1_lines, text2_lines, fromfile=fromfile, tofile=tofile)
-    return "".join(diff)
+    if not patience:
+        diff = difflib.unified_diff(text1_lines, text2_lines, fromfile=fromfile, tofile=tofile, n=n)
+        return "".join(diff)
+    groups = _grouped_opcodes(_opcodes(patience_matching_blocks(text1_lines, text2_lines)), n)
+    return "".join(
+        _unified_diff(text1_lines.__getitem__, text2_lines.__getitem__, groups, fromfile, tofile)
+    )
+
+
+def _line_digest(line: str) -> bytes:
+    return hashlib.blake2b(line.encode(), digest_size=16).digest()
+
+
+def _lines_at(filepath: str, ranges: Iterable[tuple[int, int]]) -> dict[int, str]:
+    """the lines of a file at sorted index ranges, read in one streaming pass"""
+    wanted = sorted(ranges)
+    lines: dict[int, str] = {}
+    if not wanted:
+        return lines
+    k = 0
+    with open(filepath, "r") as file:
+        for i, line in enumerate(file):
+            while k < len(wanted) and wanted[k][1] <= i:
+                k += 1
+            if k == len(wanted):
+                break
+            if wanted[k][0] <= i:
+                lines[i] = line
+    return lines
+
+
+def file_diff(
+    filepath1: str,
+    filepath2: str,
+    fromfile: str | None = None,
+    tofile: str | None = None,
+    n: int = 3,
+    max_lines: int | None = None,
+) -> str:
+    """
+    Patience unified diff of two files without holding both in memory: the common prefix is
+    skipped while reading in lockstep, the rest is kept as line digests, and only the lines in
+    hunks are read back. At most `max_lines` lines of diff are returned.
+    """
+    prefix = 0
+    digests: tuple[list[bytes], list[bytes]] = ([], [])
+    with open(filepath1, "r") as file1, open(filepath2, "r") as file2:
+        # zip would consume a line of file1 that is lost when file2 is a prefix of it
+        for line1, line2 in zip_longest(file1, file2):
+            if line1 != line2:
+                if line1 is not None:
+                    digests[0].append(_line_digest(line1))
+                if line2 is not None:
+                    digests[1].append(_line_digest(line2))
+                break
+            prefix += 1
+        digests[0].extend(map(_line_digest, file1))
+        digests[1].extend(map(_line_digest, file2))
+
+    blocks = [(prefix + i, prefix + j, size) for i, j, size in patience_matching_blocks(*digests)]
+    if prefix:
+        blocks.insert(0, (0, 0, prefix))
+    groups = tuple(_grouped_opcodes(_opcodes(blocks), n))
+    a_lines = _lines_at(filepath1, ((g[0][1], g[-1][2]) for g in groups))
+    b_lines = _lines_at(filepath2, ((g[0][3], g[-1][4]) for g in groups))
+    diff = _unified_diff(
+        a_lines.__getitem__,
+        b_lines.__getitem__,
+        groups,
+        filepath1 if fromfile is None else fromfile,
+        filepath2 if tofile is None else tofile,
+    )
+    return "".join(diff if max_lines is None else islice(diff, max_lines))
 
 
 def join(x: Sequence[str], sep: str = "") -> str:
@@ -79,9 +559,110 @@ def _test() -> None:
 
     print(f"to_upper_camel_case: {upper_camel_case("this_is_to_upper_camel_case")}")
 
+    import polars as pl
+
+    names = [
+        "this_is_a.name",
+        "__Leading and trailing__",
+        "HTTPResponse-code 2",
+        "",
+        "a..b__c",
+        "ß_x9",
+    ]
+    for f, f_batch in (
+        (upper_camel_case, upper_camel_case_batch),
+        (snake_case, snake_case_batch),
+        (to_underscore, to_underscore_batch),
+        (space_case, space_case_batch),
+    ):
+        expected = tuple(map(f, names))
+        assert f_batch(names) == expected, f.__name__
+        assert f_batch(names * 3, cache=True) == expected * 3, f.__name__
+        assert tuple(f_batch(pl.Series("names", names)).to_list()) == expected, f.__name__
+    assert _snake_case_cached.cache_info().hits == 2 * len(names)
+
     sa = "this is a line\nthis is still the same\nthis is the third line\nthis is the fourth line\n"
     sb = "this is a line\nthis is still the same\nthis is just another line\nthis is the fourth line\n"
     string_diff_result = string_diff(sa, sb)
+    assert string_diff(sa, sb, patience=True) == string_diff_result
+
+    import os.path as osp
+    import random
+    import tempfile
+
+    for seed in range(200):
+        rng = random.Random(seed)
+        lines1 = [f"{rng.randrange(8)}\n" for _ in range(rng.randrange(30))]
+        lines2 = [x for x in lines1 if rng.random() < 0.8] + [
+            f"{rng.randrange(8)}\n"
+        ] * rng.randrange(3)
+        rng.shuffle(lines2[: rng.randrange(len(lines2) + 1)])
+        blocks = patience_matching_blocks(lines1, lines2)
+        rebuilt = []
+        for tag, i1, i2, j1, j2 in _opcodes(blocks):
+            assert tag != "equal" or lines1[i1:i2] == lines2[j1:j2], f"seed {seed}: bad match"
+            rebuilt += lines1[i1:i2] if tag == "equal" else lines2[j1:j2]
+        assert rebuilt == lines2, f"seed {seed}: opcodes do not rebuild the text"
+
+    # repetitive, heavily edited texts have no unique anchors and too many edits for Myers
+    import time
+
+    rng = random.Random(0)
+    lines1 = [rng.choice("abcd") + "\n" for _ in range(20000)]
+    lines2 = [x if rng.random() < 0.7 else rng.choice("abcd") + "\n" for x in lines1]
+    start = time.perf_counter()
+    blocks = patience_matching_blocks(lines1, lines2)
+    assert time.perf_counter() - start < 10, "patience diff is quadratic on repetitive texts"
+    rebuilt = []
+    for tag, i1, i2, j1, j2 in _opcodes(blocks):
+        assert tag != "equal" or lines1[i1:i2] == lines2[j1:j2]
+        rebuilt += lines1[i1:i2] if tag == "equal" else lines2[j1:j2]
+    assert rebuilt == lines2
+
+    text1 = "".join(f"line {i}\n" for i in range(10000))
+    text2 = text1.replace("line 5000\n", "changed\n").replace("line 9999\n", "")
+    with tempfile.TemporaryDirectory() as dirname:
+        filepath1, filepath2 = osp.join(dirname, "a.txt"), osp.join(dirname, "b.txt")
+        for filepath, text in ((filepath1, text1), (filepath2, text2)):
+            with open(filepath, "w") as f:
+                f.write(text)
+        expected = string_diff(text1, text2, "a", "b")
+        assert string_diff(text1, text2, "a", "b", patience=True) == expected
+        assert file_diff(filepath1, filepath2, "a", "b") == expected
+        assert file_diff(filepath1, filepath2, "a", "b", max_lines=4) == "".join(
+            expected.splitlines(keepends=True)[:4]
+        )
+        assert file_diff(filepath1, filepath1) == ""
+        for text3, text4 in (("x\ny\n", "x\n"), ("x\ny\nz\n", "x\n"), ("x\n", "x\ny\nz\n")):
+            for filepath, text in ((filepath1, text3), (filepath2, text4)):
+                with open(filepath, "w") as f:
+                    f.write(text)
+            expected = string_diff(text3, text4, "a", "b", patience=True)
+            assert expected and file_diff(filepath1, filepath2, "a", "b") == expected
+
+    for seed in range(500):
+        rng = random.Random(seed)
+        text = "".join(rng.choice(["a", " ", "  ", "\n", "[", "x = 1"]) for _ in range(40))
+        options = dict(
+            spaces=rng.choice([None, 0, 1, 2]),
+            double_spaces=rng.choice([None, 1, 2]),
+            blank_line_before_left_bracket=rng.random() < 0.5,
+            newlines_at_the_end=rng.choice([None, 0, 1, 2]),
+        )
+        expected = text
+        if options["spaces"] is not None:
+            expected = normalized_spaces(expected, options["spaces"])
+        if options["double_spaces"] is not None:
+            expected = normalized_double_spaces(expected, options["double_spaces"])
+        if options["blank_line_before_left_bracket"]:
+            expected = ensure_blank_line_before_left_bracket(expected)
+        if options["newlines_at_the_end"] is not None:
+            expected = have_newlines_at_the_end(expected, n=options["newlines_at_the_end"])
+        assert normalized_text(text, **options) == expected, f"seed {seed}: {options}"
+        cuts = sorted(rng.sample(range(len(text) + 1), 5))
+        chunks = [text[i:j] for i, j in zip([0, *cuts], [*cuts, len(text)])]
+        assert "".join(normalized_text_chunks(chunks, **options)) == expected, f"seed {seed}"
+
     print(sa)
     print(sb)
     print(string_diff_result)
@@ -5,8 +5,7 @@ import subprocess
 import warnings
 from collections.abc import Sequence
 
-from .os import read_file
-from .string import join
+from .files import tail
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +27,7 @@ def subprocess_run_stdout_logged(
         )
 
     if subproc_out.returncode != 0:
-        logger.info(join(read_file(log_file_path).splitlines(keepends=True)[-16:]))
+        logger.info(tail(log_file_path, 16))
         message = f"Error in running {" ".join(command)}:\n{subproc_out.stderr}"
         logger.error(message)
         warnings.warn(message)
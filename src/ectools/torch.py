@@ -16,17 +16,88 @@ def seed_torch_(seed: int | None) -> None:
     return
 
 
+def _diagonal_value(value: number_like | Tensor, diag: Tensor) -> Tensor:
+    """
+    value broadcast, not copied, against the diagonals shaped (*batch, length): a (length,) tensor
+    runs along each diagonal, and one value per matrix is given as values[..., None]
+    """
+    value = torch.as_tensor(value, dtype=diag.dtype, device=diag.device)
+    return value.expand(diag.shape)
+
+
 def set_diagonal(
-    x: Tensor, value: number_like, *, offset: int = 0, dim1: int = -2, dim2: int = -1
+    x: Tensor,
+    value: number_like | Tensor,
+    *,
+    offset: int = 0,
+    dim1: int = -2,
+    dim2: int = -1,
+    out: Tensor | None = None,
 ) -> Tensor:
-    dshape = x.diagonal(offset=offset, dim1=dim1, dim2=dim2).shape
-    src = torch.full(dshape, value, dtype=x.dtype, device=x.device)
+    if out is not None:
+        return fill_diagonal(x, value, offset=offset, dim1=dim1, dim2=dim2, out=out)
+    src = _diagonal_value(value, x.diagonal(offset=offset, dim1=dim1, dim2=dim2))
     return torch.diagonal_scatter(x, src, offset=offset, dim1=dim1, dim2=dim2)
 
 
+def fill_diagonal_(
+    x: Tensor, value: number_like | Tensor, *, offset: int = 0, dim1: int = -2, dim2: int = -1
+) -> Tensor:
+    """in place, so autograd rejects leaves requiring grad; use set_diagonal or torch.no_grad()"""
+    diag = x.diagonal(offset=offset, dim1=dim1, dim2=dim2)
+    if isinstance(value, Tensor) and value.ndim > 0:
+        diag.copy_(_diagonal_value(value, diag))
+    else:
+        diag.fill_(value)
+    return x
+
+
 def fill_diagonal(
-    x: torch.Tensor, value: number_like, *, offset: int = 0, dim1: int = -2, dim2: int = -1
+    x: torch.Tensor,
+    value: number_like | Tensor,
+    *,
+    offset: int = 0,
+    dim1: int = -2,
+    dim2: int = -1,
+    out: Tensor | None = None,
 ) -> torch.Tensor:
-    x = x.clone()
-    x.diagonal(offset=offset, dim1=dim1, dim2=dim2).fill_(value)
-    return x
+    if out is None:
+        out = x.clone()
+    elif out is not x:
+        out.copy_(x)
+    return fill_diagonal_(out, value, offset=offset, dim1=dim1, dim2=dim2)
+
+
+def _test() -> None:
+    x = torch.ones(3, 4, 4)
+    expected = torch.ones(3, 4, 4) - torch.eye(4)
+    assert torch.equal(fill_diagonal(x, 0), expected) and torch.equal(x, torch.ones(3, 4, 4))
+    assert torch.equal(set_diagonal(x, 0), expected)
+    assert fill_diagonal_(x, 0) is x and torch.equal(x, expected)
+
+    values = torch.tensor([1.0, 2.0, 3.0])
+    for f in (fill_diagonal, set_diagonal, fill_diagonal_):
+        result = f(torch.zeros(3, 4, 4), values[:, None], offset=1)
+        for i in range(3):
+            assert torch.all(result[i].diagonal(offset=1) == i + 1), f"{f.__name__} batch {i}"
+        result = f(torch.zeros(3, 3, 3), values)
+        assert all(torch.equal(result[i].diagonal(), values) for i in range(3)), "B == N broadcast"
+
+    x = torch.ones(2, 5, 5)
+    out = torch.empty_like(x)
+    assert fill_diagonal(x, 0, out=out) is out and torch.equal(out, fill_diagonal(x, 0))
+    assert set_diagonal(x, 0, out=out) is out and torch.equal(out, set_diagonal(x, 0))
+    assert torch.equal(fill_diagonal_(x.transpose(-2, -1), 0), fill_diagonal(x, 0))
+
+    leaf = torch.ones(3, 3, requires_grad=True)
+    y = fill_diagonal_(leaf * 2, torch.zeros(()))
+    y.sum().backward()
+    assert torch.equal(leaf.grad, 2 * (torch.ones(3, 3) - torch.eye(3))), "gradient through view"
+    set_diagonal(leaf, 0).sum().backward()
+
+    print("All tests passed.")
+
+
+# python -m src.ectools.torch
+if __name__ == "__main__":
+    _test()